@@ -0,0 +1,76 @@
+"""
+Measures the import time of the CLI with `python -X importtime`, optionally failing when it exceeds a budget.
+
+Usage:
+    python benchmarks/bench_import_time.py [--module bitbucket_code_insight_reports.cli] [--top 10] [--max_ms 150]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import(module):
+    """
+    Imports a module in a fresh interpreter with import timing enabled.
+    Args:
+        module: name of the module to import
+    Returns:
+        List of (cumulative microseconds, self microseconds, module name) for every module imported
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = PACKAGE_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        env=env,
+        check=True,
+    )
+
+    timings = []
+    for line in result.stderr.splitlines():
+        # Lines look like `import time:       123 |       4567 |   package.module`
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = [field.strip() for field in line[len("import time:") :].split("|")]
+        if self_us.isdigit():
+            timings.append((int(cumulative_us), int(self_us), name))
+    return timings
+
+
+def main(argv):
+    """Runs the benchmark and prints the results, returning non-zero if the budget was exceeded."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--module", type=str, default="bitbucket_code_insight_reports.cli", help="Module to import.")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list.")
+    parser.add_argument("--max_ms", type=float, default=None, help="Fail if the import takes longer than this.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs to take the best time from.")
+    args = parser.parse_args(argv)
+
+    runs = [measure_import(args.module) for _ in range(args.repeat)]
+    best = min(runs, key=lambda timings: sum(self_us for _, self_us, _ in timings))
+    total_ms = sum(self_us for _, self_us, _ in best) / 1000.0
+
+    print(
+        "Importing {module}: {total:.1f} ms, {count} modules".format(
+            module=args.module, total=total_ms, count=len(best)
+        )
+    )
+    for cumulative_us, self_us, name in sorted(best, reverse=True)[: args.top]:
+        print(
+            "{cumulative:10.1f} ms {self:10.1f} ms  {name}".format(
+                cumulative=cumulative_us / 1000.0, self=self_us / 1000.0, name=name
+            )
+        )
+
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print("Import time exceeds the budget of {budget:.1f} ms".format(budget=args.max_ms))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
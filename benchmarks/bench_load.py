@@ -0,0 +1,118 @@
+"""
+Load tests the upload path by publishing many reports at once to the bundled fake Code Insights server.
+
+Usage:
+    python benchmarks/bench_load.py [--reports 200] [--annotations 500] [--concurrency 16] [--latency 0.02]
+        [--error_rate 0.01] [--throttle_rate 0.01] [--async]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bitbucket_code_insight_reports.async_report import publish_reports
+from bitbucket_code_insight_reports.fake_server import FakeCodeInsightsServer
+from bitbucket_code_insight_reports.report import Report
+from bitbucket_code_insight_reports.session import create_session
+
+from synthetic import annotations
+
+
+def percentile(values, fraction):
+    """
+    Returns the value below which the given fraction of the sorted values fall.
+    """
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main(argv):
+    """Runs the load test and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--reports", type=int, default=200, help="Number of reports to publish.")
+    parser.add_argument("--annotations", type=int, default=500, help="Number of annotations per report.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Number of reports published at once.")
+    parser.add_argument("--upload_workers", type=int, default=2, help="Annotation upload workers per report.")
+    parser.add_argument("--latency", type=float, default=0.02, help="Server latency per request, in seconds.")
+    parser.add_argument("--error_rate", type=float, default=0.01, help="Fraction of requests failing with 500.")
+    parser.add_argument("--throttle_rate", type=float, default=0.01, help="Fraction of requests rejected with 429.")
+    parser.add_argument("--batch_size", type=int, default=100, help="Annotations per request.")
+    parser.add_argument(
+        "--async", dest="use_async", action="store_true", help="Publish from one event loop with AsyncReport."
+    )
+    args = parser.parse_args(argv)
+
+    server = FakeCodeInsightsServer(
+        latency=args.latency, error_rate=args.error_rate, throttle_rate=args.throttle_rate, seed=0
+    ).start()
+    session = create_session(pool_size=args.concurrency * args.upload_workers, backoff_factor=0.01)
+
+    latencies = []
+    latencies_lock = threading.Lock()
+
+    def record_latency(response, *_args, **_kwargs):
+        with latencies_lock:
+            latencies.append(response.elapsed.total_seconds())
+
+    session.hooks["response"].append(record_latency)
+
+    annotations_string = json.dumps({"annotations": list(annotations(args.annotations))})
+    reports = [
+        Report(
+            ("user", "password"),
+            server.url,
+            "PROJECT",
+            "repo",
+            "{index:040x}".format(index=index),
+            "load-test",
+            "Load test",
+            "Load test report",
+            "FAIL",
+            annotations_string,
+            session=session,
+        )
+        for index in range(args.reports)
+    ]
+
+    def publish(report):
+        report.post_base_report()
+        return report.post_annotations(batch_size=args.batch_size, workers=args.upload_workers)
+
+    start = time.perf_counter()
+    if args.use_async:
+        loop = asyncio.new_event_loop()
+        results = loop.run_until_complete(
+            publish_reports(
+                reports,
+                concurrency=args.concurrency * args.upload_workers,
+                backoff_factor=0.01,
+                batch_size=args.batch_size,
+                workers=args.upload_workers,
+            )
+        )
+        loop.close()
+    else:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(publish, reports))
+    failed_batches = sum(len(errors) for errors in results)
+    elapsed = time.perf_counter() - start
+    server.stop()
+
+    latencies.sort()
+    uploaded = sum(len(report_annotations) for report_annotations in server.annotations.values())
+    print("Reports:             {count:,}".format(count=args.reports))
+    print("Requests received:   {count:,}".format(count=server.requests_received))
+    print("Annotations stored:  {count:,}".format(count=uploaded))
+    print("Failed batches:      {count:,}".format(count=failed_batches))
+    print("Elapsed:             {time:.2f}s".format(time=elapsed))
+    print("Throughput:          {rate:,.0f} annotations/s".format(rate=uploaded / elapsed))
+    if latencies:
+        # Only recorded for the blocking session
+        print("Request latency p50: {latency:.1f} ms".format(latency=percentile(latencies, 0.5) * 1000))
+        print("Request latency p99: {latency:.1f} ms".format(latency=percentile(latencies, 0.99) * 1000))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,132 @@
+"""
+Times the annotation parser of every report class on synthetic tool output and measures its peak memory use.
+
+Usage:
+    python benchmarks/bench_parsers.py [--sizes 1000 100000 1000000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bitbucket_code_insight_reports.git_diff_report import GitDiffReport
+from bitbucket_code_insight_reports.lint_report import LINT_PARSERS, LintReport
+from bitbucket_code_insight_reports.report import Report
+from bitbucket_code_insight_reports.sarif_report import SarifReport
+from bitbucket_code_insight_reports.spell_check_report import SpellCheckReport
+from bitbucket_code_insight_reports.terraform_report import TerraformReport
+
+from synthetic import (
+    custom_compact_lines,
+    custom_jsonl_lines,
+    custom_report_lines,
+    flake8_output_lines,
+    git_diff_lines,
+    sarif_lines,
+    scspell_output_lines,
+    terraform_diff_lines,
+    write_lines,
+)
+
+
+class Flake8Report(LintReport):
+    """
+    Lint report with its parser set on the class, as the benchmark skips `__init__`
+    """
+
+    parser = LINT_PARSERS["flake8"]
+
+
+CASES = [
+    ("git-diff", GitDiffReport, git_diff_lines),
+    ("terraform", TerraformReport, terraform_diff_lines),
+    ("spell-check", SpellCheckReport, scspell_output_lines),
+    ("custom", Report, custom_report_lines),
+    ("custom-compact", Report, custom_compact_lines),
+    ("custom-jsonl", Report, custom_jsonl_lines),
+    ("lint-flake8", Flake8Report, flake8_output_lines),
+    ("sarif", SarifReport, sarif_lines),
+]
+
+
+def parse_file(report_class, file_name):
+    """
+    Runs a report class's parser over a file, the same way `Report.__init__` does, without running the tool itself.
+    Args:
+        report_class: Report class whose parser to run
+        file_name: file holding the tool output
+    Returns:
+        Number of annotations parsed
+    """
+    report = report_class.__new__(report_class)
+    report.title = "Benchmark"
+    with open(file_name, mode="r") as report_file:
+        annotations = report._process_annotations_file(report_file)  # pylint: disable=protected-access
+    return len(annotations)
+
+
+def benchmark(report_class, file_name, repeat):
+    """
+    Times a parser and measures the peak memory it allocates.
+    Args:
+        report_class: Report class whose parser to run
+        file_name: file holding the tool output
+        repeat: number of timed runs to take the best from
+    Returns:
+        Tuple of the best time in seconds, the peak memory in bytes and the number of annotations
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = parse_file(report_class, file_name)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Tracing slows the parser down a lot, so memory is measured in a separate run
+    tracemalloc.start()
+    parse_file(report_class, file_name)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, count
+
+
+def main(argv):
+    """Runs the benchmark and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 100000, 1000000], help="Numbers of lines of tool output."
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs to take the best time from.")
+    args = parser.parse_args(argv)
+
+    print(
+        "{name:<14} {lines:>10} {annotations:>12} {time:>10} {rate:>14} {peak:>12}".format(
+            name="report", lines="lines", annotations="annotations", time="time", rate="lines/s", peak="peak memory"
+        )
+    )
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for size in args.sizes:
+            for name, report_class, generate in CASES:
+                file_name = os.path.join(temp_dir, "{name}-{size}.txt".format(name=name, size=size))
+                write_lines(file_name, generate(size))
+                with open(file_name, mode="r") as output_file:
+                    lines = sum(1 for _ in output_file)
+
+                elapsed, peak, count = benchmark(report_class, file_name, args.repeat)
+                print(
+                    "{name:<14} {lines:>10,} {annotations:>12,} {time:>9.3f}s {rate:>14,.0f} {peak:>10.1f}MB".format(
+                        name=name,
+                        lines=lines,
+                        annotations=count,
+                        time=elapsed,
+                        rate=lines / elapsed,
+                        peak=peak / 2 ** 20,
+                    )
+                )
+                os.remove(file_name)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,89 @@
+"""
+Compares the throughput of the shared unified diff tokenizer against the regex split parsers it replaced.
+
+Usage:
+    python benchmarks/bench_unified_diff.py [--lines 200000] [--repeat 5]
+"""
+import argparse
+import re
+import sys
+import time
+from io import StringIO
+
+from bitbucket_code_insight_reports.unified_diff import iter_hunks
+
+from synthetic import git_diff_lines, terraform_diff_lines
+
+
+def legacy_git_diff_hunks(diff):
+    """
+    The regex split parser previously used by GitDiffReport, kept for comparison.
+    """
+    hunks = []
+    split_output = re.compile(r"(diff --git.*(.*\n){4})").split(diff)
+    for file_errors_counter in range(1, len(split_output), 3):
+        path = split_output[file_errors_counter + 1][6:-1]
+        entries = re.compile(r"(@{2}[\+\-\,\d\ ]*@{2})").split(split_output[file_errors_counter + 2])
+        for error_counter in range(1, len(entries), 2):
+            hunks.append((path, entries[error_counter].split(" ")[1][1:].split(",")[0]))
+    return hunks
+
+
+def legacy_terraform_hunks(diff):
+    """
+    The regex split parser previously used by TerraformReport, kept for comparison.
+    """
+    hunks = []
+    split_output = re.compile(r"(.*\n-{3}.*\n\+{3}.*)").split(diff)
+    for file_errors_counter in range(1, len(split_output), 2):
+        path = split_output[file_errors_counter].split("\n")[0]
+        entries = re.compile(r"(@{2}[\+\-\,\d\ ]*@{2})").split(split_output[file_errors_counter + 1])
+        for error_counter in range(1, len(entries), 2):
+            hunks.append((path, entries[error_counter].split(" ")[1][1:].split(",")[0]))
+    return hunks
+
+
+def time_parser(parser, diff, repeat):
+    """
+    Times the fastest of several runs of a parser.
+    Args:
+        parser: function taking the diff string
+        diff: diff to parse
+        repeat: number of runs
+    Returns:
+        Tuple of the best time in seconds and the number of hunks found
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hunks = parser(diff)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(hunks)
+
+
+def main(argv):
+    """Runs the benchmark and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--lines", type=int, default=200000, help="Number of lines in the synthetic diffs.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs to take the best time from.")
+    args = parser.parse_args(argv)
+
+    cases = [
+        ("git diff", git_diff_lines, legacy_git_diff_hunks),
+        ("terraform fmt", terraform_diff_lines, legacy_terraform_hunks),
+    ]
+    for name, generate, legacy in cases:
+        diff = "".join(generate(args.lines))
+        lines = diff.count("\n")
+        for label, parse in [("regex split", legacy), ("iter_hunks", lambda d: list(iter_hunks(StringIO(d))))]:
+            elapsed, hunks = time_parser(parse, diff, args.repeat)
+            print(
+                "{name:<14} {label:<12} {hunks:>8} hunks {elapsed:8.4f}s {rate:12,.0f} lines/s".format(
+                    name=name, label=label, hunks=hunks, elapsed=elapsed, rate=lines / elapsed
+                )
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
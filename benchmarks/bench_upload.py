@@ -0,0 +1,65 @@
+"""
+Measures annotation upload throughput against a fake Code Insights endpoint running in this process.
+
+Usage:
+    python benchmarks/bench_upload.py [--annotations 100000] [--workers 1 4 8]
+"""
+import argparse
+import json
+import sys
+import time
+
+from bitbucket_code_insight_reports.fake_server import FakeCodeInsightsServer
+from bitbucket_code_insight_reports.report import Report
+from bitbucket_code_insight_reports.session import create_session
+
+from synthetic import annotations
+
+
+def main(argv):
+    """Runs the benchmark and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--annotations", type=int, default=100000, help="Number of annotations to upload.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8], help="Upload worker counts to try.")
+    args = parser.parse_args(argv)
+
+    server = FakeCodeInsightsServer(max_annotations_per_report=None).start()
+    annotations_string = json.dumps({"annotations": list(annotations(args.annotations))})
+
+    for workers in args.workers:
+        session = create_session(pool_size=workers)
+        report = Report(
+            ("user", "password"),
+            server.url,
+            "PROJECT",
+            "repo",
+            "0123456789abcdef",
+            "benchmark",
+            "Benchmark",
+            "Upload benchmark",
+            "FAIL",
+            annotations_string,
+            session=session,
+        )
+
+        server.reports.clear()
+        server.annotations.clear()
+
+        start = time.perf_counter()
+        report.post_base_report()
+        errors = report.post_annotations(workers=workers)
+        elapsed = time.perf_counter() - start
+        received = sum(len(report_annotations) for report_annotations in server.annotations.values())
+
+        print(
+            "{workers:>3} workers: {count:,} annotations in {time:.3f}s, {rate:,.0f} annotations/s, {errors} failed batches".format(
+                workers=workers, count=received, time=elapsed, rate=received / elapsed, errors=len(errors),
+            )
+        )
+        session.close()
+
+    server.stop()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,196 @@
+"""
+Generators for synthetic tool output used by the benchmarks, sized by number of lines
+"""
+import json
+
+HUNK_LINES = 9
+
+
+def git_diff_lines(total_lines, hunks_per_file=10):
+    """
+    Generates `git diff` output.
+    Args:
+        total_lines: approximate number of lines to generate
+        hunks_per_file: number of hunks in each file
+    Yields:
+        Lines of the diff
+    """
+    file_index = 0
+    generated = 0
+    while generated < total_lines:
+        path = "src/module_{index}/file_{index}.c".format(index=file_index)
+        yield "diff --git a/{path} b/{path}\n".format(path=path)
+        yield "index 1111111..2222222 100644\n"
+        yield "--- a/{path}\n".format(path=path)
+        yield "+++ b/{path}\n".format(path=path)
+        generated += 4
+        for hunk_index in range(hunks_per_file):
+            line = hunk_index * 20 + 1
+            yield "@@ -{line},7 +{line},7 @@ int function_{index}()\n".format(line=line, index=hunk_index)
+            for _ in range(3):
+                yield " context\n"
+            yield "-removed line\n"
+            yield "+added line\n"
+            for _ in range(3):
+                yield " context\n"
+            generated += HUNK_LINES
+        file_index += 1
+
+
+def terraform_diff_lines(total_lines, hunks_per_file=10):
+    """
+    Generates `terraform fmt -diff` output.
+    Args:
+        total_lines: approximate number of lines to generate
+        hunks_per_file: number of hunks in each file
+    Yields:
+        Lines of the diff
+    """
+    file_index = 0
+    generated = 0
+    while generated < total_lines:
+        path = "infra/module_{index}/main.tf".format(index=file_index)
+        yield "{path}\n".format(path=path)
+        yield "--- old/{path}\n".format(path=path)
+        yield "+++ new/{path}\n".format(path=path)
+        generated += 3
+        for hunk_index in range(hunks_per_file):
+            line = hunk_index * 20 + 1
+            yield "@@ -{line},5 +{line},5 @@\n".format(line=line)
+            yield ' resource "a" "b" {\n'
+            yield "-  x  = 1\n"
+            yield "+  x = 1\n"
+            for _ in range(3):
+                yield " }\n"
+            generated += 7
+        file_index += 1
+
+
+def scspell_output_lines(total_lines, findings_per_file=20):
+    """
+    Generates scspell report output.
+    Args:
+        total_lines: number of findings to generate
+        findings_per_file: number of findings in each file
+    Yields:
+        Lines of the output, without a trailing newline on the last one
+    """
+    for index in range(total_lines):
+        path = "src/module_{file}/file.cpp".format(file=index // findings_per_file)
+        line = "{path}:{line}: 'wrold{index}' not found in dictionary (from token 'wrold{index}')".format(
+            path=path, line=index % findings_per_file + 1, index=index
+        )
+        yield line if index == total_lines - 1 else line + "\n"
+
+
+def flake8_output_lines(total_lines, findings_per_file=20):
+    """
+    Generates flake8 output.
+    Args:
+        total_lines: number of findings to generate
+        findings_per_file: number of findings in each file
+    Yields:
+        Lines of the output
+    """
+    codes = ["E501 line too long (88 > 79 characters)", "F401 'os' imported but unused", "W291 trailing whitespace"]
+    for index in range(total_lines):
+        yield "./src/module_{file}/file.py:{line}:1: {message}\n".format(
+            file=index // findings_per_file, line=index % findings_per_file + 1, message=codes[index % len(codes)]
+        )
+
+
+def annotations(total):
+    """
+    Generates annotation dictionaries in the format posted to BitBucket.
+    Args:
+        total: number of annotations
+    Yields:
+        Annotation dictionaries
+    """
+    for index in range(total):
+        yield {
+            "path": "src/module_{file}/file.cpp".format(file=index // 20),
+            "line": index % 20 + 1,
+            "message": "Synthetic finding {index}".format(index=index),
+            "severity": "HIGH" if index % 3 else "LOW",
+        }
+
+
+def custom_report_lines(total_lines):
+    """
+    Generates a custom report JSON document, with one annotation per line.
+    Args:
+        total_lines: number of annotations to generate
+    Yields:
+        Lines of the JSON document
+    """
+    yield '{"annotations": [\n'
+    for index, annotation in enumerate(annotations(total_lines)):
+        yield json.dumps(annotation) + (",\n" if index < total_lines - 1 else "\n")
+    yield "]}\n"
+
+
+def custom_compact_lines(total_lines):
+    """
+    Generates a custom report JSON document on a single line, as written by `json.dump`.
+    Args:
+        total_lines: number of annotations to generate
+    Yields:
+        The document
+    """
+    yield json.dumps({"annotations": list(annotations(total_lines))}) + "\n"
+
+
+def custom_jsonl_lines(total_lines):
+    """
+    Generates a custom report in JSON Lines format, with one annotation per line.
+    Args:
+        total_lines: number of annotations to generate
+    Yields:
+        Lines of the report
+    """
+    for annotation in annotations(total_lines):
+        yield json.dumps(annotation) + "\n"
+
+
+def sarif_lines(total_lines):
+    """
+    Generates a SARIF document with one result per line.
+    Args:
+        total_lines: number of results to generate
+    Yields:
+        Lines of the document
+    """
+    rules = [
+        {"id": "S{index:03}".format(index=index), "defaultConfiguration": {"level": "warning"}} for index in range(3)
+    ]
+    yield '{"version": "2.1.0", "runs": [{"tool": {"driver": {"name": "scanner", "rules": %s}}, "results": [\n' % (
+        json.dumps(rules)
+    )
+    for index, annotation in enumerate(annotations(total_lines)):
+        result = {
+            "ruleId": rules[index % len(rules)]["id"],
+            "ruleIndex": index % len(rules),
+            "message": {"text": annotation["message"]},
+            "locations": [
+                {
+                    "physicalLocation": {
+                        "artifactLocation": {"uri": annotation["path"]},
+                        "region": {"startLine": annotation["line"], "startColumn": 1},
+                    }
+                }
+            ],
+        }
+        yield json.dumps(result) + (",\n" if index < total_lines - 1 else "\n")
+    yield "]}]}\n"
+
+
+def write_lines(file_name, lines):
+    """
+    Writes generated lines to a file.
+    Args:
+        file_name: path to write to
+        lines: iterable of lines
+    """
+    with open(file_name, mode="w") as output_file:
+        output_file.writelines(lines)
@@ -0,0 +1,201 @@
+"""
+Module with the compact annotation model shared by all report types
+"""
+import hashlib
+import heapq
+import json
+import sys
+
+# Fields every annotation has, in the order they're serialized
+ANNOTATION_FIELDS = ("path", "line", "message", "severity")
+_ANNOTATION_FIELD_SET = frozenset(ANNOTATION_FIELDS)
+SEVERITIES = ("LOW", "MEDIUM", "HIGH")
+# Annotations of the severities listed first are kept first when a report has more than it can hold
+SEVERITY_RANKS = {"HIGH": 0, "MEDIUM": 1, "LOW": 2}
+
+
+def _intern(value):
+    """
+    Interns strings so the many annotations sharing a path or severity share a single string object.
+    """
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _to_line(line):
+    """
+    Converts a line number read from a tool or JSON input to an int, leaving it as is if it isn't numeric.
+    """
+    if isinstance(line, str):
+        line = line.strip()
+        return int(line) if line.isdigit() else line
+    return line
+
+
+def parse_annotation(value, index):
+    """
+    Creates an annotation from a decoded JSON value, checking it has the fields BitBucket requires.
+    Args:
+        value: decoded JSON value
+        index: position of the annotation in the input, for error messages
+    Returns:
+        Annotation
+    Raises:
+        ValueError: if the value isn't a valid annotation
+    """
+    if not isinstance(value, dict):
+        raise ValueError("Annotation {index} is not an object".format(index=index))
+    if not isinstance(value.get("message"), str):
+        raise ValueError("Annotation {index} has no message".format(index=index))
+    annotation = Annotation.from_dict(value)
+    if annotation.severity not in SEVERITIES:
+        raise ValueError(
+            "Annotation {index} has severity {severity!r}, expected one of {severities}".format(
+                index=index, severity=annotation.severity, severities=", ".join(SEVERITIES)
+            )
+        )
+    if annotation.line is not None and (not isinstance(annotation.line, int) or annotation.line < 0):
+        raise ValueError("Annotation {index} has invalid line {line!r}".format(index=index, line=annotation.line))
+    return annotation
+
+
+def count_annotations(annotations):
+    """
+    Counts the annotations of each severity and on each file, in a single pass over them.
+    Args:
+        annotations: list of Annotations
+    Returns:
+        Tuple of dictionaries counting the annotations of each severity and on each path, annotations on the report
+        as a whole aren't counted for any path
+    """
+    severity_counts = dict.fromkeys(SEVERITIES, 0)
+    path_counts = {}
+    for annotation in annotations:
+        severity_counts[annotation.severity] = severity_counts.get(annotation.severity, 0) + 1
+        if annotation.path is not None:
+            path_counts[annotation.path] = path_counts.get(annotation.path, 0) + 1
+    return severity_counts, path_counts
+
+
+def cap_annotations(annotations, max_annotations, is_changed=None, severity_counts=None):
+    """
+    Keeps the most important annotations, in a single pass over them with a bounded heap. Higher severities are kept
+    first, then annotations on changed lines, then those the tool reported first.
+    Args:
+        annotations: list of Annotations
+        max_annotations: maximum number of annotations to keep
+        is_changed: (optional) function taking an Annotation and returning True if it's on a changed line
+        severity_counts: (optional) number of annotations of each severity, see `count_annotations`, counted here if
+            not given
+    Returns:
+        Tuple of the kept annotations, in their original order, and a dictionary counting the dropped annotations
+        of each severity
+    """
+    if len(annotations) <= max_annotations:
+        return annotations, {}
+
+    def _rank(indexed):
+        index, annotation = indexed
+        changed = is_changed is not None and is_changed(annotation)
+        return SEVERITY_RANKS.get(annotation.severity, len(SEVERITY_RANKS)), not changed, index
+
+    kept = sorted(heapq.nsmallest(max_annotations, enumerate(annotations), key=_rank))
+    if severity_counts is None:
+        severity_counts, _ = count_annotations(annotations)
+    dropped = dict(severity_counts)
+    for _, annotation in kept:
+        dropped[annotation.severity] -= 1
+    return [annotation for _, annotation in kept], {severity: count for severity, count in dropped.items() if count}
+
+
+class Annotation:
+    """
+    Single annotation on a report, kept as a slotted object rather than a dictionary since reports can hold hundreds
+    of thousands of them
+    """
+
+    __slots__ = ANNOTATION_FIELDS + ("extra",)
+
+    def __init__(self, path, line, message, severity, extra=None):  # pylint: disable=too-many-arguments
+        """
+        Creates the annotation. The values are stored as given to keep this cheap for parsers, which should pass an
+        int line and intern paths shared by many annotations (see `sys.intern`). Messages are mostly unique, so
+        interning them costs more than it saves.
+        Args:
+            path: path of the file the annotation applies to
+            line: line number the annotation applies to
+            message: message to show
+            severity: severity of the annotation (LOW/MEDIUM/HIGH)
+            extra: (optional) dictionary of any other fields to upload, e.g. `link` or `externalId`
+        """
+        self.path = path
+        self.line = line
+        self.message = message
+        self.severity = severity
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, annotation):
+        """
+        Creates an annotation from a dictionary in the format of the BitBucket API, converting the line to an int and
+        interning the path and severity.
+        Args:
+            annotation: annotation dictionary
+        Returns:
+            Annotation
+        """
+        extra = None
+        if not _ANNOTATION_FIELD_SET.issuperset(annotation):
+            extra = {name: value for name, value in annotation.items() if name not in _ANNOTATION_FIELD_SET}
+        return cls(
+            _intern(annotation.get("path")),
+            _to_line(annotation.get("line")),
+            annotation.get("message"),
+            _intern(annotation.get("severity")),
+            extra,
+        )
+
+    def to_dict(self):
+        """
+        Converts the annotation to a dictionary in the format of the BitBucket API, leaving out unset fields.
+        Returns:
+            Annotation dictionary
+        """
+        annotation = {name: getattr(self, name) for name in ANNOTATION_FIELDS if getattr(self, name) is not None}
+        if self.extra:
+            annotation.update(self.extra)
+        return annotation
+
+    @property
+    def external_id(self):
+        """
+        ID to identify the annotation on the server by, a hash of its contents unless the input provided one, so the
+        same finding gets the same ID on every run.
+        """
+        if self.extra and "externalId" in self.extra:
+            return self.extra["externalId"]
+        identity = [self.path, str(self.line), self.message, self.severity]
+        return hashlib.sha1(json.dumps(identity).encode("utf-8")).hexdigest()
+
+    def __eq__(self, other):
+        if not isinstance(other, Annotation):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return "Annotation({fields})".format(
+            fields=", ".join("{name}={value!r}".format(name=name, value=getattr(self, name)) for name in self.__slots__)
+        )
+
+
+def serialize_batch(batch):
+    """
+    Serializes a batch of annotations to the JSON request body posting them.
+    Args:
+        batch: list of tuples of the external ID and the Annotation
+    Returns:
+        UTF-8 encoded JSON body
+    """
+    annotations = ", ".join(
+        json.dumps(dict(annotation.to_dict(), externalId=external_id)) for external_id, annotation in batch
+    )
+    return '{{"annotations": [{annotations}]}}'.format(annotations=annotations).encode("utf-8")
@@ -0,0 +1,149 @@
+"""
+Module which uploads reports with asyncio, so a single event loop can publish hundreds of reports at once. Requires
+aiohttp, installed with the `async` extra.
+"""
+import asyncio
+from base64 import b64encode
+
+from .annotation import serialize_batch
+from .report import batch_errors, split_batches
+from .session import (
+    DEFAULT_BACKOFF_FACTOR,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_RETRIES,
+    DEFAULT_UPLOAD_WORKERS,
+    MAX_ANNOTATIONS_PER_REQUEST,
+    RETRY_STATUS_CODES,
+)
+
+
+def _import_aiohttp():
+    """
+    Imports aiohttp, which is only needed for asynchronous uploads.
+    Raises:
+        ImportError: if aiohttp isn't installed
+    """
+    try:
+        import aiohttp  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        raise ImportError("aiohttp must be installed to upload reports asynchronously, e.g. with the async extra.")
+    return aiohttp
+
+
+def create_async_session(pool_size=DEFAULT_POOL_SIZE):
+    """
+    Creates an aiohttp session which keeps connections to BitBucket open for reuse. Must be called from a coroutine.
+    Args:
+        pool_size: (optional) maximum number of connections to keep open
+    Returns:
+        aiohttp.ClientSession, to be closed by the caller
+    """
+    aiohttp = _import_aiohttp()
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=pool_size))
+
+
+async def publish_reports(  # pylint: disable=too-many-arguments
+    reports, concurrency=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, backoff_factor=DEFAULT_BACKOFF_FACTOR, **kwargs
+):
+    """
+    Publishes several reports at once over one shared session.
+    Args:
+        reports: list of Reports, of any report type
+        concurrency: (optional) maximum number of requests in flight across all the reports
+        retries: (optional) number of times to retry a request on connection errors or server errors
+        backoff_factor: (optional) seconds to wait before the first retry, doubling for each further retry
+        kwargs: further arguments for `AsyncReport.publish`
+    Returns:
+        List of the upload errors of each report
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    async with create_async_session(pool_size=concurrency) as session:
+        uploads = [AsyncReport(report, session, semaphore, retries, backoff_factor) for report in reports]
+        return await asyncio.gather(*[upload.publish(**kwargs) for upload in uploads])
+
+
+class AsyncReport:
+    """
+    Publishes a report with asyncio instead of blocking requests. The report is built as usual by its report class,
+    so all report types are supported.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self, report, session, semaphore=None, retries=DEFAULT_RETRIES, backoff_factor=DEFAULT_BACKOFF_FACTOR
+    ):
+        """
+        Sets up the upload.
+        Args:
+            report: Report to publish
+            session: aiohttp.ClientSession to upload with, see `create_async_session`
+            semaphore: (optional) asyncio.Semaphore bounding the requests in flight, share one between reports to
+                bound them all together
+            retries: (optional) number of times to retry a request on connection errors or server errors
+            backoff_factor: (optional) seconds to wait before the first retry, doubling for each further retry
+        """
+        self.report = report
+        self.session = session
+        self.semaphore = semaphore if semaphore is not None else asyncio.Semaphore(DEFAULT_POOL_SIZE)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        # Sent as a header as aiohttp is deprecating its own auth argument, encoded the same way requests does
+        credentials = "{user}:{password}".format(user=report.auth[0], password=report.auth[1])
+        self._auth_header = "Basic " + b64encode(credentials.encode("latin1")).decode("ascii")
+
+    async def publish(self, batch_size=MAX_ANNOTATIONS_PER_REQUEST, workers=DEFAULT_UPLOAD_WORKERS):
+        """
+        Publishes the report and then its annotations, split into batches which are uploaded concurrently.
+        Args:
+            batch_size: (optional) maximum number of annotations to send per request
+            workers: (optional) maximum number of batches of this report to upload at once
+        Returns:
+            List of error strings, also stored in the report's `upload_errors`
+        """
+        report = self.report
+        error = await self._send("PUT", report.url, json=report._base_report_body())  # pylint: disable=protected-access
+        if error is not None:
+            report.upload_errors = ["Creating report: {error}".format(error=error)]
+            return report.upload_errors
+
+        annotations_url = report.url + "/annotations"
+        batches = split_batches(report._identified_annotations(), batch_size)  # pylint: disable=protected-access
+        batch_semaphore = asyncio.Semaphore(workers)
+
+        async def _post_batch(batch):
+            async with batch_semaphore:
+                return await self._send(
+                    "POST", annotations_url, data=serialize_batch(batch), headers={"Content-Type": "application/json"}
+                )
+
+        results = await asyncio.gather(*[_post_batch(batch) for batch in batches])
+        report.upload_errors = batch_errors(batches, results)
+        return report.upload_errors
+
+    async def _send(self, method, url, **kwargs):
+        """
+        Sends an authenticated request, retrying on connection errors and the status codes the blocking session
+        retries on.
+        Args:
+            method: HTTP method
+            url: URL to send the request to
+            kwargs: further arguments for the request
+        Returns:
+            None on success, otherwise a string describing the failure.
+        """
+        aiohttp = _import_aiohttp()
+        headers = dict(kwargs.pop("headers", {}), Authorization=self._auth_header)
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff_factor * 2 ** (attempt - 1))
+            try:
+                async with self.semaphore:
+                    async with self.session.request(method, url, headers=headers, **kwargs) as response:
+                        if response.status < 400:
+                            return None
+                        error = "{status} {reason}".format(status=response.status, reason=response.reason)
+                        if response.status not in RETRY_STATUS_CODES:
+                            return error
+            except (aiohttp.ClientError, asyncio.TimeoutError) as client_error:
+                error = str(client_error) or type(client_error).__name__
+        return error
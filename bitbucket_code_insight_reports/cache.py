@@ -0,0 +1,114 @@
+"""
+Module which caches check results on disk between runs, keyed by the hash of the content that was checked
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+DEFAULT_CACHE_SIZE = 100 * 1024 * 1024
+CACHE_FILE_SUFFIX = ".json"
+
+
+def hash_file(file_name):
+    """
+    Hashes the contents of a file.
+    Args:
+        file_name: path of the file to hash
+    Returns:
+        Hex digest of the contents
+    """
+    digest = hashlib.sha256()
+    with open(file_name, mode="rb") as hashed_file:
+        for block in iter(lambda: hashed_file.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_key(*parts):
+    """
+    Combines several strings into a single cache key.
+    Args:
+        parts: strings identifying the result, e.g. content hashes and tool versions
+    Returns:
+        Hex digest usable as a cache key
+    """
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Size bounded on-disk cache of JSON serializable results, evicting the least recently used entries
+    """
+
+    def __init__(self, cache_dir, max_size=DEFAULT_CACHE_SIZE):
+        """
+        Sets up the cache, creating the directory if needed.
+        Args:
+            cache_dir: directory to store the cached results in
+            max_size: (optional) size in bytes the cache is pruned down to
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        """
+        Returns the path of the file storing the entry for the key.
+        """
+        return os.path.join(self.cache_dir, key + CACHE_FILE_SUFFIX)
+
+    def get(self, key):
+        """
+        Looks up a result, marking it as recently used.
+        Args:
+            key: cache key, see `hash_key`
+        Returns:
+            The cached result, or None if there isn't one
+        """
+        path = self._path(key)
+        try:
+            with open(path, mode="r") as cache_file:
+                value = json.load(cache_file)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return value
+
+    def put(self, key, value):
+        """
+        Stores a result, replacing the file atomically so concurrent runs never read a partial entry.
+        Args:
+            key: cache key, see `hash_key`
+            value: JSON serializable result
+        """
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, mode="w") as cache_file:
+                json.dump(value, cache_file)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def prune(self):
+        """
+        Removes the least recently used entries until the cache is no larger than its maximum size.
+        """
+        entries = []
+        total_size = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(CACHE_FILE_SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # Another run may have removed it already
+                pass
+            total_size -= size
@@ -7,10 +7,32 @@ import sys
 import argparse
 from getpass import getpass
 
-from bitbucket_code_insight_reports.report import Report
-from bitbucket_code_insight_reports.terraform_report import TerraformReport
-from bitbucket_code_insight_reports.git_diff_report import GitDiffReport
-from bitbucket_code_insight_reports.spell_check_report import SpellCheckReport
+from bitbucket_code_insight_reports.cache import DEFAULT_CACHE_SIZE
+from bitbucket_code_insight_reports import dict_index
+from bitbucket_code_insight_reports.factory import create_report, reads_stdin, REPORT_TYPES
+from bitbucket_code_insight_reports.manifest import publish, run_manifest
+from bitbucket_code_insight_reports.session import (
+    create_session,
+    DEFAULT_RETRIES,
+    DEFAULT_UPLOAD_WORKERS,
+    MAX_ANNOTATIONS_PER_REPORT,
+)
+
+
+def parse_target(value):
+    """
+    Parses a further commit to upload the report to.
+    Args:
+        value: target in the form PROJECT/REPO/COMMIT
+    Returns:
+        Tuple of the project key, repository slug and commit ID
+    Raises:
+        argparse.ArgumentTypeError: if the target isn't in the expected form
+    """
+    target = tuple(value.split("/"))
+    if len(target) != 3 or not all(target):
+        raise argparse.ArgumentTypeError("expected PROJECT/REPO/COMMIT, got {value!r}".format(value=value))
+    return target
 
 
 def parse_args(args):
@@ -20,11 +42,22 @@ def parse_args(args):
     parser = argparse.ArgumentParser(description="Uploads information to code insights in BitBucket.")
 
     parser.add_argument(
-        "--file", type=str, default=None, help="Input file for report (not required for all report types.)"
+        "--file",
+        type=str,
+        default=None,
+        help="Input file for report (not required for all report types.) The custom, lint and sarif report types "
+        "read stdin given `-`, the lint and sarif report types also without a file.",
     )
     parser.add_argument(
         "--silent", action="store_true", default=False, help="Don't output what has been sent to BitBucket."
     )
+    parser.add_argument(
+        "--daemon_socket",
+        type=str,
+        default=None,
+        help="Unix socket of a daemon started with `bitbucket-code-insight-reports serve --socket SOCKET`, to run the "
+        "report in instead of in this process.",
+    )
     parser.add_argument(
         "--force_pass",
         action="store_true",
@@ -37,11 +70,31 @@ def parse_args(args):
     auth_group.add_argument("-p", "--password", type=str, default=None, help="Password to authenticated with BitBucket")
 
     report_info_group = parser.add_argument_group("Report Options", description="Options to configure the report")
-    report_info_group.add_argument("--report_key", type=str, required=True, help="BitBucket key for report.")
-    report_info_group.add_argument("--report_title", type=str, required=True, help="Human readable title for report.")
-    report_info_group.add_argument("--report_desc", type=str, required=True, help="Description for the report.")
+    report_info_group.add_argument("--report_key", type=str, help="BitBucket key for report.")
+    report_info_group.add_argument("--report_title", type=str, help="Human readable title for report.")
+    report_info_group.add_argument("--report_desc", type=str, help="Description for the report.")
+    report_info_group.add_argument("--report_type", choices=REPORT_TYPES, help="Report type")
+    report_info_group.add_argument(
+        "--manifest",
+        type=str,
+        default=None,
+        help="YAML or JSON file listing several reports to run for the commit, instead of a single report. YAML "
+        "manifests need PyYAML, installed with the yaml extra.",
+    )
     report_info_group.add_argument(
-        "--report_type", choices=["terraform", "git-diff", "spell-check", "custom"], required=True, help="Report type"
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used to build the reports in a manifest, to spell check files, or to run "
+        "terraform fmt on separate directories.",
+    )
+    report_info_group.add_argument(
+        "--max_annotations",
+        type=int,
+        default=MAX_ANNOTATIONS_PER_REPORT,
+        help="Maximum number of annotations to upload per report, BitBucket rejects more than {max} by default. "
+        "Higher severities are kept first, then annotations on lines changed in the diff, the rest are counted in "
+        "the report's data fields.".format(max=MAX_ANNOTATIONS_PER_REPORT),
     )
 
     bitbucket_group = parser.add_argument_group(
@@ -53,6 +106,45 @@ def parse_args(args):
     bitbucket_group.add_argument(
         "--commit", type=str, required=True, help="Commit hash for the commit to upload the report to."
     )
+    bitbucket_group.add_argument(
+        "--targets",
+        nargs="+",
+        type=parse_target,
+        default=None,
+        metavar="PROJECT/REPO/COMMIT",
+        help="Further commits to upload the same report to, e.g. the merge commit of a PR or the commit in a mirrored "
+        "repository. The tool runs once and the same requests are sent to every commit concurrently.",
+    )
+
+    upload_group = parser.add_argument_group("Upload Options", description="Options to tune uploading to BitBucket")
+    upload_group.add_argument(
+        "--upload_workers",
+        type=int,
+        default=DEFAULT_UPLOAD_WORKERS,
+        help="Number of annotation batches to upload to BitBucket in parallel.",
+    )
+    upload_group.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        help="Number of times to retry a request on connection errors or server errors.",
+    )
+    upload_group.add_argument(
+        "--sync",
+        action="store_true",
+        help="Only upload annotations which changed since the last run for the commit, and delete stale ones.",
+    )
+
+    cache_group = parser.add_argument_group("Cache Options", description="Options to reuse results between runs")
+    cache_group.add_argument(
+        "--cache_dir", type=str, default=None, help="Directory to cache results in, caching is disabled if not set."
+    )
+    cache_group.add_argument(
+        "--cache_size",
+        type=int,
+        default=DEFAULT_CACHE_SIZE,
+        help="Size in bytes the cache is pruned to, least recently used results are removed first.",
+    )
 
     custom_report_group = parser.add_argument_group(
         "Custom Report Options", description="Arguments only for use with the custom report type."
@@ -65,7 +157,20 @@ def parse_args(args):
         type=str,
         default=None,
         help="""Annotations in a JSON string as shown in
-        https://docs.atlassian.com/bitbucket-server/rest/5.16.0/bitbucket-code-insights-rest.html#idm361726402736""",
+        https://docs.atlassian.com/bitbucket-server/rest/5.16.0/bitbucket-code-insights-rest.html#idm361726402736,
+        or as JSON Lines with one annotation per line. Use --file instead for large reports, which are then read
+        incrementally.""",
+    )
+
+    lint_report_group = parser.add_argument_group(
+        "Lint Report Options", description="Arguments only for use with the lint report type."
+    )
+    lint_report_group.add_argument(
+        "--linter",
+        type=str,
+        default=None,
+        help="Linter whose output is read from --file, or from stdin without a file: flake8, pylint (default text "
+        "format), eslint (unix formatter), shellcheck (gcc format), or a parser installed by another package.",
     )
 
     spellcheck_report_group = parser.add_argument_group(
@@ -79,6 +184,29 @@ def parse_args(args):
         default=[],
         help="Path to dictionaries to include when spell checking",
     )
+    spellcheck_report_group.add_argument(
+        "--dict_index",
+        type=str,
+        default=None,
+        help="Index of further words to accept, compiled from natural dictionaries with "
+        "`bitbucket-code-insight-reports compile-dict --output INDEX DICT...`. Faster than passing large "
+        "dictionaries with --dict, as the index is memory mapped instead of parsed on every run.",
+    )
+    spellcheck_diff_group = spellcheck_report_group.add_mutually_exclusive_group()
+    spellcheck_diff_group.add_argument(
+        "--diff_file",
+        type=str,
+        default=None,
+        help="Unified diff (e.g. from `git diff -U0`), only lines it adds or changes are spell checked. Also applies "
+        "to the other report types, which keep annotations on these lines first when capping.",
+    )
+    spellcheck_diff_group.add_argument(
+        "--base_ref",
+        type=str,
+        default=None,
+        help="Commit to diff HEAD against, only lines changed since then are spell checked. Also applies to the "
+        "terraform report type, which then only checks the terraform files changed since then.",
+    )
     spellcheck_filelist_group = spellcheck_report_group.add_mutually_exclusive_group()
     spellcheck_filelist_group.add_argument(
         "--file_list", nargs="+", type=str, default=None, help="List of files to check."
@@ -90,89 +218,78 @@ def parse_args(args):
         help="File containing a newline separated list of files to check.",
     )
 
-    return parser.parse_args(args)
+    parsed_args = parser.parse_args(args)
+
+    if parsed_args.manifest is None:
+        missing = [
+            "--" + option
+            for option in ["report_key", "report_title", "report_desc", "report_type"]
+            if getattr(parsed_args, option) is None
+        ]
+        if missing:
+            parser.error("the following arguments are required: {options}".format(options=", ".join(missing)))
+    if parsed_args.targets and parsed_args.sync:
+        parser.error("--sync can't be combined with --targets")
+
+    return parsed_args
 
 
 def main():
     """Console script for bitbucket_code_insight_reports."""
-    args = parse_args(sys.argv[1:])
+    argv = sys.argv[1:]
+    if argv[:1] == ["serve"]:
+        # Only imported when used, as Unix sockets aren't available on every platform
+        from bitbucket_code_insight_reports import daemon  # pylint: disable=import-outside-toplevel
+
+        return daemon.main(argv[1:])
+    if argv[:1] == ["compile-dict"]:
+        return dict_index.main(argv[1:])
+
+    args = parse_args(argv)
 
     if args.password is None:
         password = getpass("Enter your BitBucket Server password: ")
     else:
         password = args.password
 
-    auth = (args.user, password)
-
-    if args.report_type == "terraform":
-        report = TerraformReport(
-            auth,
-            args.base_url,
-            args.project_key,
-            args.repo_slug,
-            args.commit,
-            args.report_key,
-            args.report_title,
-            args.report_desc,
-            force_pass=args.force_pass,
-        )
-    elif args.report_type == "git-diff":
-        if args.file is None:
-            print("You must provide a file for the git-diff report type.")
-            exit(1)
-        report = GitDiffReport(
-            auth,
-            args.base_url,
-            args.project_key,
-            args.repo_slug,
-            args.commit,
-            args.report_key,
-            args.report_title,
-            args.report_desc,
-            args.file,
-            force_pass=args.force_pass,
-        )
-    elif args.report_type == "custom":
-        report = Report(
-            auth,
-            args.base_url,
-            args.project_key,
-            args.repo_slug,
-            args.commit,
-            args.report_key,
-            args.report_title,
-            args.report_desc,
-            args.status,
-            args.annotations,
-            force_pass=args.force_pass,
-        )
-    elif args.report_type == "spell-check":
-        if args.file_list:
-            files_list = args.file_list
-        elif args.file_list_from_file:
-            files_list = args.file_list_from_file.read().strip().split("\n")
-        else:
-            print("You must provide a file list or a file with the file list")
-            exit(1)
-        report = SpellCheckReport(
-            auth,
-            args.base_url,
-            args.project_key,
-            args.repo_slug,
-            args.commit,
-            args.report_key,
-            args.report_title,
-            args.report_desc,
-            force_pass=args.force_pass,
-            files_to_check=files_list,
-            dictionaries=args.dict,
-        )
-
-    report.post_base_report()
-    report.post_annotations()
+    if args.daemon_socket:
+        from bitbucket_code_insight_reports import daemon  # pylint: disable=import-outside-toplevel
+
+        if args.password is None:
+            argv = argv + ["--password", password]
+        # The daemon has its own stdin, so input piped to this process is forwarded
+        return daemon.submit(args.daemon_socket, argv, stdin=sys.stdin if reads_stdin(args) else None)
+
+    session = create_session(pool_size=args.upload_workers * args.jobs, retries=args.retries)
+    return run(args, (args.user, password), session)
+
+
+def run(args, auth, session):
+    """
+    Creates and uploads the reports requested on the command line.
+    Args:
+        args: argparse.Namespace from `parse_args`
+        auth: authentication tuple for BitBucket
+        session: requests.Session to upload with
+    Returns:
+        Return code for the command line
+    """
+    if args.manifest:
+        return run_manifest(auth, args, session)
+
+    try:
+        report = create_report(auth, args, session=session)
+    except ValueError as error:
+        print(error)
+        return 1
+
+    upload_errors = publish(report, args)
 
     if not args.silent:
         print(report.output_info())
+    else:
+        for error in upload_errors:
+            print("Upload failed: {error}".format(error=error), file=sys.stderr)
 
     return report.return_code
 
@@ -0,0 +1,167 @@
+"""
+Module which keeps a warm process running reports for the command line, so short CI steps don't pay for starting an
+interpreter, importing the tools behind the report types and opening connections to BitBucket on every run
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import socketserver
+import sys
+import tempfile
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+
+# Size in bytes of the reads from the socket
+RECEIVE_SIZE = 64 * 1024
+
+
+def submit(socket_path, argv, cwd=None, stdin=None):
+    """
+    Runs a report in the daemon instead of in this process, passing its output through.
+    Args:
+        socket_path: path of the Unix socket the daemon listens on
+        argv: command line arguments for the report, which must include the password
+        cwd: (optional) directory to run the report in, the current directory by default
+        stdin: (optional) open file with the report's input, copied to a temporary file which is passed to the
+            report with `--file`, as the daemon can't read this process's stdin
+    Returns:
+        Return code of the report, or 1 if the daemon can't be reached
+    """
+    if stdin is not None:
+        with tempfile.NamedTemporaryFile(mode="w", prefix="bcir-stdin-", delete=False) as input_file:
+            shutil.copyfileobj(stdin, input_file)
+        try:
+            return submit(socket_path, argv + ["--file", os.path.abspath(input_file.name)], cwd=cwd)
+        finally:
+            os.unlink(input_file.name)
+
+    job = {"argv": argv, "cwd": cwd if cwd is not None else os.getcwd()}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+            client.sendall(json.dumps(job).encode("utf-8") + b"\n")
+            client.shutdown(socket.SHUT_WR)
+            response = b"".join(iter(lambda: client.recv(RECEIVE_SIZE), b""))
+    except OSError as error:
+        print(
+            "Unable to reach the report daemon on {socket_path}, is `bitbucket-code-insight-reports serve --socket "
+            "{socket_path}` running? {error}".format(socket_path=socket_path, error=error),
+            file=sys.stderr,
+        )
+        return 1
+
+    result = json.loads(response.decode("utf-8"))
+    sys.stdout.write(result["stdout"])
+    sys.stderr.write(result["stderr"])
+    return result["return_code"]
+
+
+class ReportDaemonHandler(socketserver.StreamRequestHandler):
+    """
+    Runs the report requested on a connection and answers with its output and return code
+    """
+
+    def handle(self):
+        """Reads the job, runs it and writes the result."""
+        job = json.loads(self.rfile.readline().decode("utf-8"))
+        result = self.server.run_job(job["argv"], job["cwd"])
+        self.wfile.write(json.dumps(result).encode("utf-8"))
+
+
+class ReportDaemon(socketserver.UnixStreamServer):
+    """
+    Serves report jobs on a Unix socket, one at a time as each job runs in its own working directory. The modules
+    imported by a job, as well as the upload sessions and their open connections, are kept for the following jobs.
+    """
+
+    def __init__(self, socket_path):
+        """
+        Sets up the daemon, replacing a socket left behind by a previous daemon. Only the current user can connect.
+        Args:
+            socket_path: path of the Unix socket to listen on
+        """
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        previous_umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, ReportDaemonHandler)
+        finally:
+            os.umask(previous_umask)
+        self.sessions = {}
+
+    def server_close(self):
+        """Closes the socket and removes its file."""
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+    def get_session(self, pool_size, retries):
+        """
+        Returns the upload session for the given options, creating it on first use.
+        Args:
+            pool_size: maximum number of connections to keep open
+            retries: number of times to retry failed requests
+        Returns:
+            requests.Session shared with the other jobs using the same options
+        """
+        from .session import create_session  # pylint: disable=import-outside-toplevel
+
+        key = (pool_size, retries)
+        if key not in self.sessions:
+            self.sessions[key] = create_session(pool_size=pool_size, retries=retries)
+        return self.sessions[key]
+
+    def run_job(self, argv, cwd):
+        """
+        Runs a report as the command line would, capturing its output.
+        Args:
+            argv: command line arguments for the report
+            cwd: directory to run the report in
+        Returns:
+            Dictionary with the return code and the captured stdout and stderr
+        """
+        from . import cli  # pylint: disable=import-outside-toplevel
+
+        stdout = StringIO()
+        stderr = StringIO()
+        previous_cwd = os.getcwd()
+        try:
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                os.chdir(cwd)
+                try:
+                    args = cli.parse_args(argv)
+                    session = self.get_session(args.upload_workers * args.jobs, args.retries)
+                    return_code = cli.run(args, (args.user, args.password), session)
+                except SystemExit as error:
+                    return_code = error.code if isinstance(error.code, int) else 1
+                except Exception:  # pylint: disable=broad-except
+                    # Report the failure to the client and keep serving
+                    traceback.print_exc()
+                    return_code = 1
+        finally:
+            os.chdir(previous_cwd)
+        return {"return_code": return_code or 0, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+
+def main(argv=None):
+    """
+    Runs the daemon in the foreground.
+    """
+    parser = argparse.ArgumentParser(
+        prog="bitbucket-code-insight-reports serve",
+        description="Runs reports for the command line given --daemon_socket, keeping the tools loaded between them.",
+    )
+    parser.add_argument("--socket", type=str, required=True, help="Path of the Unix socket to listen on.")
+    args = parser.parse_args(argv)
+
+    daemon = ReportDaemon(args.socket)
+    print("Serving reports on {socket}".format(socket=args.socket))
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    daemon.server_close()
+    return 0
@@ -0,0 +1,146 @@
+"""
+Module which compiles scspell dictionaries into a sorted binary index, looked up through a memory map so it takes no
+time to load and its pages are shared by every process reading it
+"""
+import argparse
+import mmap
+import struct
+
+# Index layout: the magic, the number of words, the offset of each word and of the end of the last word relative to
+# the start of the words, then the UTF-8 encoded words in sorted order
+INDEX_MAGIC = b"BCIRIDX1"
+_COUNT = struct.Struct("<Q")
+_OFFSET = struct.Struct("<Q")
+NATURAL_HEADER = "NATURAL:"
+
+
+def read_dictionary_words(file_name):
+    """
+    Reads the words of the natural language dictionary in an scspell dictionary file.
+    Args:
+        file_name: path of the dictionary file
+    Returns:
+        List of words
+    Raises:
+        ValueError: if the file has file type or file ID dictionaries, which only apply to some files and so can't
+            be merged into the index
+    """
+    words = []
+    with open(file_name, mode="r", encoding="utf-8") as dictionary_file:
+        for line_number, line in enumerate(dictionary_file, 1):
+            line = line.strip(" \r\n")
+            if ":" in line:
+                if line != NATURAL_HEADER:
+                    raise ValueError(
+                        "{file}:{line}: only natural dictionaries can be compiled, pass dictionaries with '{header}' "
+                        "with --dict instead".format(file=file_name, line=line_number, header=line)
+                    )
+            elif line:
+                words.append(line)
+    return words
+
+
+def compile_index(dictionaries, index_file_name):
+    """
+    Merges the natural language dictionaries of scspell dictionary files into a single index file.
+    Args:
+        dictionaries: list of paths of dictionary files
+        index_file_name: path to write the index to
+    Returns:
+        Number of words in the index
+    """
+    words = sorted({word.encode("utf-8") for file_name in dictionaries for word in read_dictionary_words(file_name)})
+    offsets = [0]
+    for word in words:
+        offsets.append(offsets[-1] + len(word))
+    with open(index_file_name, mode="wb") as index_file:
+        index_file.write(INDEX_MAGIC)
+        index_file.write(_COUNT.pack(len(words)))
+        index_file.write(struct.pack("<{count}Q".format(count=len(offsets)), *offsets))
+        index_file.write(b"".join(words))
+    return len(words)
+
+
+class DictionaryIndex:
+    """
+    Read-only view of a compiled index, matching words the same way as scspell's natural language dictionary: a
+    word matches if it's a prefix of a word in the index
+    """
+
+    def __init__(self, index_file_name):
+        """
+        Maps the index into memory, only the pages visited by lookups are ever read.
+        Args:
+            index_file_name: path of an index written by `compile_index`
+        Raises:
+            ValueError: if the file isn't an index
+        """
+        with open(index_file_name, mode="rb") as index_file:
+            self._map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[: len(INDEX_MAGIC)] != INDEX_MAGIC:
+            self._map.close()
+            raise ValueError("{file} is not a dictionary index".format(file=index_file_name))
+        (self._count,) = _COUNT.unpack_from(self._map, len(INDEX_MAGIC))
+        self._offsets_start = len(INDEX_MAGIC) + _COUNT.size
+        self._words_start = self._offsets_start + (self._count + 1) * _OFFSET.size
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Unmaps the index.
+        """
+        self._map.close()
+
+    def _word(self, index):
+        """
+        Reads the word at a position in the index, as UTF-8 encoded bytes.
+        """
+        start, end = struct.unpack_from("<2Q", self._map, self._offsets_start + index * _OFFSET.size)
+        return self._map[self._words_start + start : self._words_start + end]
+
+    def match(self, word):
+        """
+        Checks whether a word is a prefix of a word in the index, with a binary search over the sorted words.
+        Args:
+            word: word to look up
+        Returns:
+            True if the word matches
+        """
+        encoded = word.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._word(middle) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        return low < self._count and self._word(low).startswith(encoded)
+
+
+def main(argv=None):
+    """
+    Compiles dictionaries from the command line.
+    """
+    parser = argparse.ArgumentParser(
+        prog="bitbucket-code-insight-reports compile-dict",
+        description="Merges scspell dictionaries into an index for the spell-check report's --dict_index option.",
+    )
+    parser.add_argument("dictionaries", nargs="+", type=str, help="scspell dictionary files to merge.")
+    parser.add_argument("--output", type=str, required=True, help="Path to write the index to.")
+    args = parser.parse_args(argv)
+
+    try:
+        count = compile_index(args.dictionaries, args.output)
+    except (OSError, ValueError) as error:
+        print(error)
+        return 1
+    print("Compiled {count} words into {output}".format(count=count, output=args.output))
+    return 0
@@ -0,0 +1,188 @@
+"""
+Module which creates reports from command line (or manifest) options
+"""
+from importlib import import_module
+
+from .cache import ResultCache
+from .unified_diff import changed_line_ranges, git_changed_files, git_changed_line_ranges
+
+# Report class for each report type, only imported once a report of that type is created so the CLI doesn't pay
+# for importing the tools behind the other report types
+REPORT_CLASSES = {
+    "terraform": "bitbucket_code_insight_reports.terraform_report.TerraformReport",
+    "git-diff": "bitbucket_code_insight_reports.git_diff_report.GitDiffReport",
+    "spell-check": "bitbucket_code_insight_reports.spell_check_report.SpellCheckReport",
+    "lint": "bitbucket_code_insight_reports.lint_report.LintReport",
+    "sarif": "bitbucket_code_insight_reports.sarif_report.SarifReport",
+    "custom": "bitbucket_code_insight_reports.report.Report",
+}
+REPORT_TYPES = list(REPORT_CLASSES)
+# Report types which read their input from stdin when no file is given
+STDIN_REPORT_TYPES = ("lint", "sarif")
+
+
+def get_report_class(report_type):
+    """
+    Imports the report class for a report type.
+    Args:
+        report_type: one of REPORT_TYPES
+    Returns:
+        Report class for the report type
+    Raises:
+        ValueError: if the report type is unknown
+    """
+    if report_type not in REPORT_CLASSES:
+        raise ValueError("Unknown report type: {report_type}".format(report_type=report_type))
+    module_name, class_name = REPORT_CLASSES[report_type].rsplit(".", 1)
+    return getattr(import_module(module_name), class_name)
+
+
+def reads_stdin(options):
+    """
+    Checks whether the report described by the options reads its input from stdin.
+    Args:
+        options: argparse.Namespace holding the report options, as produced by `cli.parse_args`
+    Returns:
+        True if the report reads stdin
+    """
+    if options.file is None:
+        return options.report_type in STDIN_REPORT_TYPES
+    return options.file == "-"
+
+
+def create_report(auth, options, session=None):
+    """
+    Creates the report described by the options.
+    Args:
+        auth: Authentication tuple for BitBucket
+        options: argparse.Namespace holding the report options, as produced by `cli.parse_args`
+        session: (optional) requests.Session to upload the report with
+    Returns:
+        Report for the requested report type
+    Raises:
+        ValueError: if the options are missing something the report type requires
+    """
+    common_args = (
+        auth,
+        options.base_url,
+        options.project_key,
+        options.repo_slug,
+        options.commit,
+        options.report_key,
+        options.report_title,
+        options.report_desc,
+    )
+    report_class = get_report_class(options.report_type)
+    changed_lines = _read_changed_lines(options)
+    # Annotations on changed lines are kept first when a report has more annotations than it can hold
+    capping_args = {"max_annotations": options.max_annotations, "changed_lines": changed_lines}
+
+    if options.report_type == "terraform":
+        return report_class(
+            *common_args,
+            force_pass=options.force_pass,
+            session=session,
+            jobs=options.jobs,
+            changed_files=git_changed_files(options.base_ref) if options.base_ref else None,
+            cache=_create_cache(options),
+            **capping_args
+        )
+
+    if options.report_type == "git-diff":
+        if options.file is None:
+            raise ValueError("You must provide a file for the git-diff report type.")
+        return report_class(*common_args, options.file, force_pass=options.force_pass, session=session, **capping_args)
+
+    if options.report_type == "lint":
+        if options.linter is None:
+            raise ValueError("You must provide a linter for the lint report type.")
+        return report_class(
+            *common_args,
+            options.linter,
+            file_name=options.file if options.file is not None else "-",
+            force_pass=options.force_pass,
+            session=session,
+            **capping_args
+        )
+
+    if options.report_type == "sarif":
+        return report_class(
+            *common_args,
+            file_name=options.file if options.file is not None else "-",
+            force_pass=options.force_pass,
+            session=session,
+            **capping_args
+        )
+
+    if options.report_type == "spell-check":
+        if options.file_list:
+            files_list = options.file_list
+        elif options.file_list_from_file:
+            files_list = _read_file_list(options.file_list_from_file)
+        elif changed_lines is not None:
+            files_list = None
+        else:
+            raise ValueError("You must provide a file list, a file with the file list, or a diff to check")
+        return report_class(
+            *common_args,
+            force_pass=options.force_pass,
+            session=session,
+            files_to_check=files_list,
+            dictionaries=options.dict,
+            dict_index=options.dict_index,
+            jobs=options.jobs,
+            cache=_create_cache(options),
+            **capping_args
+        )
+
+    # The remaining report type is custom, its annotations are read from the file if one is given
+    return report_class(
+        *common_args,
+        options.status,
+        options.annotations,
+        file_name=options.file,
+        force_pass=options.force_pass,
+        session=session,
+        **capping_args
+    )
+
+
+def _create_cache(options):
+    """
+    Creates the result cache requested in the options.
+    Args:
+        options: argparse.Namespace holding the report options
+    Returns:
+        ResultCache, or None if caching wasn't requested
+    """
+    return ResultCache(options.cache_dir, options.cache_size) if options.cache_dir else None
+
+
+def _read_changed_lines(options):
+    """
+    Reads the changed line ranges from the diff file or base commit given in the options.
+    Args:
+        options: argparse.Namespace holding the report options
+    Returns:
+        Dictionary mapping paths to lists of changed line ranges, or None if no diff was requested
+    """
+    if options.diff_file:
+        with open(options.diff_file, mode="r") as diff_file:
+            return changed_line_ranges(diff_file)
+    if options.base_ref:
+        return git_changed_line_ranges(options.base_ref)
+    return None
+
+
+def _read_file_list(file_list):
+    """
+    Reads a newline separated list of files.
+    Args:
+        file_list: open file, or path to the file, containing the list
+    Returns:
+        List of file paths
+    """
+    if isinstance(file_list, str):
+        with open(file_list, mode="r") as file_list_file:
+            return file_list_file.read().strip().split("\n")
+    return file_list.read().strip().split("\n")
@@ -0,0 +1,287 @@
+"""
+Lightweight stand-in for the BitBucket Server Code Insights REST API, for load and latency testing without a server
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs
+
+from .session import MAX_ANNOTATIONS_PER_REPORT, MAX_ANNOTATIONS_PER_REQUEST
+
+REPORT_PATH = re.compile(
+    r"^/rest/insights/1\.0/projects/(?P<project>[^/]+)/repos/(?P<repo>[^/]+)/commits/(?P<commit>[^/]+)"
+    r"/reports/(?P<key>[^/?]+)(?P<annotations>/annotations)?(?:\?(?P<query>.*))?$"
+)
+DEFAULT_MAX_ANNOTATIONS_PER_REPORT = MAX_ANNOTATIONS_PER_REPORT
+
+
+class FakeCodeInsightsHandler(BaseHTTPRequestHandler):
+    """
+    Handles the report and annotation endpoints, injecting the latency and failures configured on the server
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Fetches a report or its annotations."""
+        self._handle(self.server.get_report, self.server.get_annotations)
+
+    def do_PUT(self):  # pylint: disable=invalid-name
+        """Creates or replaces a report."""
+        self._handle(self.server.put_report, None)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Adds annotations to a report."""
+        self._handle(None, self.server.post_annotations)
+
+    def do_DELETE(self):  # pylint: disable=invalid-name
+        """Deletes a report, or some or all of its annotations."""
+        self._handle(self.server.delete_report, self.server.delete_annotations)
+
+    def _handle(self, report_handler, annotations_handler):
+        """
+        Routes the request to the server's handler for the path, after any injected latency or failure.
+        Args:
+            report_handler: server method for the report endpoint, or None if the method isn't allowed
+            annotations_handler: server method for the annotations endpoint, or None if the method isn't allowed
+        """
+        body = self._read_body()
+        match = REPORT_PATH.match(self.path)
+        handler = None
+        if match:
+            handler = annotations_handler if match.group("annotations") else report_handler
+
+        injected = self.server.inject()
+        if injected is not None:
+            status, response = injected
+        elif handler is None:
+            status, response = 405 if match else 404, {"errors": [{"message": "Not found"}]}
+        else:
+            report_id = (match.group("project"), match.group("repo"), match.group("commit"), match.group("key"))
+            request = json.loads(body.decode("utf-8")) if body else None
+            status, response = handler(report_id, request, parse_qs(match.group("query") or ""))
+
+        payload = json.dumps(response).encode("utf-8") if response is not None else b""
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_body(self):
+        """
+        Reads the request body, sent either with a Content-Length or in chunks.
+        Returns:
+            The body as bytes
+        """
+        if self.headers.get("Transfer-Encoding", "").lower() != "chunked":
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b";")[0], 16)
+            if size == 0:
+                break
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+        # Skip any trailers up to the blank line ending the body
+        while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+            pass
+        return b"".join(chunks)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        """Keeps the output quiet under load."""
+
+
+class FakeCodeInsightsServer(ThreadingMixIn, HTTPServer):
+    """
+    In-memory Code Insights server with configurable latency, error rates, throttling and annotation limits
+    """
+
+    daemon_threads = True
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        address=("127.0.0.1", 0),
+        latency=0.0,
+        error_rate=0.0,
+        throttle_rate=0.0,
+        max_annotations_per_request=MAX_ANNOTATIONS_PER_REQUEST,
+        max_annotations_per_report=DEFAULT_MAX_ANNOTATIONS_PER_REPORT,
+        seed=None,
+    ):
+        """
+        Sets up the server, call `start` to serve requests in a background thread.
+        Args:
+            address: (optional) host and port to listen on, the default picks a free port on localhost
+            latency: (optional) seconds to wait before answering each request
+            error_rate: (optional) fraction of requests to fail with a 500 response
+            throttle_rate: (optional) fraction of requests to reject with a 429 response
+            max_annotations_per_request: (optional) more annotations than this in one request are rejected
+            max_annotations_per_report: (optional) annotations beyond this many on one report are rejected, None for
+                no limit
+            seed: (optional) seed for the random failures, to make runs repeatable
+        """
+        super().__init__(address, FakeCodeInsightsHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.max_annotations_per_request = max_annotations_per_request
+        self.max_annotations_per_report = max_annotations_per_report
+        self.reports = {}
+        self.annotations = {}
+        self.requests_received = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        """
+        Base URL to pass to reports, in place of the BitBucket server URL
+        """
+        return "http://{host}:{port}".format(host=self.server_address[0], port=self.server_address[1])
+
+    def start(self):
+        """
+        Serves requests in a background thread.
+        Returns:
+            The server, so it can be started as it's created
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """
+        Stops serving requests and closes the socket.
+        """
+        self.shutdown()
+        self.server_close()
+
+    def inject(self):
+        """
+        Applies the configured latency and decides whether to fail the request.
+        Returns:
+            None to handle the request normally, otherwise a tuple of the status and body to answer with
+        """
+        with self._lock:
+            self.requests_received += 1
+            roll = self._random.random()
+        if self.latency:
+            time.sleep(self.latency)
+        if roll < self.throttle_rate:
+            return 429, {"errors": [{"message": "Rate limit exceeded"}]}
+        if roll < self.throttle_rate + self.error_rate:
+            return 500, {"errors": [{"message": "Injected failure"}]}
+        return None
+
+    def put_report(self, report_id, request, _query):
+        """Creates or replaces a report."""
+        with self._lock:
+            self.reports[report_id] = request
+            self.annotations.setdefault(report_id, [])
+        return 200, request
+
+    def get_report(self, report_id, _request, _query):
+        """Fetches a report."""
+        with self._lock:
+            report = self.reports.get(report_id)
+        if report is None:
+            return 404, {"errors": [{"message": "Report not found"}]}
+        return 200, report
+
+    def delete_report(self, report_id, _request, _query):
+        """Deletes a report and its annotations."""
+        with self._lock:
+            self.reports.pop(report_id, None)
+            self.annotations.pop(report_id, None)
+        return 204, None
+
+    def post_annotations(self, report_id, request, _query):
+        """Adds annotations to a report, enforcing the annotation limits."""
+        new_annotations = (request or {}).get("annotations", [])
+        if len(new_annotations) > self.max_annotations_per_request:
+            return 400, {"errors": [{"message": "Too many annotations in one request"}]}
+        with self._lock:
+            if report_id not in self.reports:
+                return 404, {"errors": [{"message": "Report not found"}]}
+            annotations = self.annotations[report_id]
+            if (
+                self.max_annotations_per_report is not None
+                and len(annotations) + len(new_annotations) > self.max_annotations_per_report
+            ):
+                return 400, {"errors": [{"message": "Too many annotations on the report"}]}
+            annotations.extend(new_annotations)
+        return 204, None
+
+    def get_annotations(self, report_id, _request, _query):
+        """Fetches the annotations of a report."""
+        with self._lock:
+            annotations = list(self.annotations.get(report_id, []))
+        return 200, {"annotations": annotations, "totalCount": len(annotations)}
+
+    def delete_annotations(self, report_id, _request, query):
+        """Deletes the annotations with the given `externalId`s, or all annotations if none are given."""
+        external_ids = set(query.get("externalId", []))
+        with self._lock:
+            if external_ids:
+                self.annotations[report_id] = [
+                    annotation
+                    for annotation in self.annotations.get(report_id, [])
+                    if annotation.get("externalId") not in external_ids
+                ]
+            else:
+                self.annotations[report_id] = []
+        return 204, None
+
+
+def main(argv=None):
+    """
+    Runs the fake server in the foreground.
+    """
+    parser = argparse.ArgumentParser(description="Runs a fake BitBucket Server Code Insights endpoint.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=7990, help="Port to listen on.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering each request.")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Fraction of requests to fail with 500.")
+    parser.add_argument("--throttle_rate", type=float, default=0.0, help="Fraction of requests to reject with 429.")
+    parser.add_argument(
+        "--max_annotations_per_request",
+        type=int,
+        default=MAX_ANNOTATIONS_PER_REQUEST,
+        help="Reject requests with more annotations than this.",
+    )
+    parser.add_argument(
+        "--max_annotations_per_report",
+        type=int,
+        default=DEFAULT_MAX_ANNOTATIONS_PER_REPORT,
+        help="Reject annotations beyond this many on one report.",
+    )
+    args = parser.parse_args(argv)
+
+    server = FakeCodeInsightsServer(
+        (args.host, args.port),
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        max_annotations_per_request=args.max_annotations_per_request,
+        max_annotations_per_report=args.max_annotations_per_report,
+    )
+    print("Serving fake Code Insights on {url}".format(url=server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())  # pragma: no cover
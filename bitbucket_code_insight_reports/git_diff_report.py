@@ -1,10 +1,12 @@
 """
 Module which generates a report based on the output of git diff
 """
-import re
 import os
+from io import StringIO
 
+from .annotation import Annotation
 from .report import Report
+from .unified_diff import iter_hunks
 
 
 class GitDiffReport(Report):
@@ -13,7 +15,18 @@ class GitDiffReport(Report):
     """
 
     def __init__(
-        self, auth, base_url, project_key, repo_slug, commit_id, key, title, description, file_name, force_pass=False
+        self,
+        auth,
+        base_url,
+        project_key,
+        repo_slug,
+        commit_id,
+        key,
+        title,
+        description,
+        file_name,
+        force_pass=False,
+        **kwargs
     ):
         # If there weren't any changes, then its a pass
         if os.stat(file_name).st_size == 0:
@@ -36,30 +49,38 @@ class GitDiffReport(Report):
             return_code=return_code,
             file_name=file_name,
             force_pass=False,
+            **kwargs
         )
 
     def _process_annotations(self, annotations_string):
         """
-        Converts `git diff` output to an annotations dictionary.
+        Converts `git diff` output to annotations.
         Args:
             annotations_string: git diff output to parse
         Returns:
-            Dictionary with the annotations.
+            List of Annotations.
         """
-        annotations = []
+        return self._process_annotations_file(StringIO(annotations_string))
 
-        if annotations_string:
-            # Split on the diff output pattern
-            split_output = re.compile(r"(diff --git.*(.*\n){4})").split(annotations_string)
-            for file_errors_counter in range(1, len(split_output), 3):
-                path = split_output[file_errors_counter + 1][6:-1]
-
-                entries = re.compile(r"(@{2}[\+\-\,\d\ ]*@{2})").split(split_output[file_errors_counter + 2])
-
-                for error_counter in range(1, len(entries), 2):
-                    line_number = entries[error_counter].split(" ")[1][1:].split(",")[0]
-                    error = "{title}: Error found starting here.".format(title=self.title)
+    def _process_annotations_file(self, report_file):
+        """
+        Converts `git diff` output to annotations, reading the diff one line at a time.
+        Args:
+            report_file: open file (or any iterable of lines) containing the git diff output
+        Returns:
+            List of Annotations.
+        """
+        return list(self._iter_annotations(report_file))
 
-                    annotations.append({"path": path, "line": line_number, "message": error, "severity": "HIGH"})
+    def _iter_annotations(self, diff_lines):
+        """
+        Yields an annotation for every hunk in the diff, as soon as its `@@` header is read.
+        Args:
+            diff_lines: iterable of git diff output lines
+        Yields:
+            Annotation for each hunk
+        """
+        error = "{title}: Error found starting here.".format(title=self.title)
 
-        return {"annotations": annotations}
+        for hunk in iter_hunks(diff_lines):
+            yield Annotation(hunk.path, hunk.start, error, "HIGH")
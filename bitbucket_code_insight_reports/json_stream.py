@@ -0,0 +1,195 @@
+"""
+Module which reads selected values out of a JSON document incrementally, so large reports never have to be loaded whole
+"""
+import json
+
+# Path component matching every element of an array
+ITEM = "item"
+READ_SIZE = 64 * 1024
+WHITESPACE = " \t\n\r"
+NUMBER_CHARS = "0123456789+-.eE"
+
+
+def read_chunks(text_file, size=READ_SIZE):
+    """
+    Reads an open text file in chunks.
+    Args:
+        text_file: open file to read
+        size: (optional) number of characters to read at a time
+    Returns:
+        Iterator over the chunks
+    """
+    return iter(lambda: text_file.read(size), "")
+
+
+def iter_values(chunks, paths):
+    """
+    Yields the values found at the given paths of a JSON document, decoding each one as soon as it has been read.
+    Paths are tuples of object keys, with `ITEM` standing for every element of an array, e.g. ("annotations", ITEM)
+    for each annotation in `{"annotations": [...]}`. Anything not on the way to one of the paths is skipped.
+    Args:
+        chunks: iterable of strings which together form the document, e.g. from `read_chunks`
+        paths: iterable of paths to yield the values of
+    Yields:
+        Tuples of the path and the decoded value, in document order
+    Raises:
+        ValueError: if the document isn't valid JSON
+    """
+    targets = set(paths)
+    prefixes = {path[:length] for path in targets for length in range(len(path))}
+    reader = _Reader(iter(chunks))
+    yield from _walk(reader, (), targets, prefixes)
+    if reader.peek() != "":
+        raise ValueError("Extra data after the JSON document at offset {offset}".format(offset=reader.offset))
+
+
+def _walk(reader, path, targets, prefixes):
+    """
+    Walks the value at the reader's position, yielding the values at the target paths within it.
+    Args:
+        reader: _Reader positioned at the value
+        path: path of the value
+        targets: set of paths to yield the values of
+        prefixes: set of paths leading to a target, which are walked rather than skipped
+    Yields:
+        Tuples of the path and the decoded value
+    """
+    if path in targets:
+        yield path, reader.decode()
+        return
+    char = reader.peek()
+    if path not in prefixes or char not in ("{", "["):
+        reader.decode()
+        return
+
+    reader.advance()
+    closing = "}" if char == "{" else "]"
+    if reader.peek() == closing:
+        reader.advance()
+        return
+    while True:
+        if char == "{":
+            key = reader.decode()
+            if not isinstance(key, str):
+                raise ValueError("Expected an object key at offset {offset}".format(offset=reader.offset))
+            reader.expect(":")
+            yield from _walk(reader, path + (key,), targets, prefixes)
+        else:
+            yield from _walk(reader, path + (ITEM,), targets, prefixes)
+        if reader.peek() == closing:
+            reader.advance()
+            return
+        reader.expect(",")
+
+
+class _Reader:
+    """
+    Buffers chunks of a JSON document, decoding one value at a time from the buffer
+    """
+
+    def __init__(self, chunks):
+        """
+        Sets up the reader.
+        Args:
+            chunks: iterator over strings which together form the document
+        """
+        self._chunks = chunks
+        self._buffer = ""
+        self._position = 0
+        self._consumed = 0
+        self._exhausted = False
+        self._decoder = json.JSONDecoder()
+
+    @property
+    def offset(self):
+        """
+        Offset of the reader in the document, for error messages
+        """
+        return self._consumed + self._position
+
+    def _fill(self, wanted=1):
+        """
+        Appends chunks to the buffer, dropping the part already read.
+        Args:
+            wanted: (optional) number of characters to read at least, unless the document ends first
+        Returns:
+            False if there were no more chunks
+        """
+        chunks = [self._buffer[self._position :]]
+        read = 0
+        for chunk in self._chunks:
+            chunks.append(chunk)
+            read += len(chunk)
+            if read >= wanted:
+                break
+        else:
+            self._exhausted = True
+        if read == 0:
+            return False
+        self._consumed += self._position
+        self._buffer = "".join(chunks)
+        self._position = 0
+        return True
+
+    def peek(self):
+        """
+        Skips whitespace and returns the next character, or an empty string at the end of the document.
+        """
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position] in WHITESPACE:
+                self._position += 1
+            if self._position < len(self._buffer) or not self._fill():
+                return self._buffer[self._position : self._position + 1]
+
+    def advance(self):
+        """
+        Moves past the character returned by `peek`.
+        """
+        self._position += 1
+
+    def expect(self, char):
+        """
+        Moves past the next character, which must be the given one.
+        Raises:
+            ValueError: if the next character is a different one
+        """
+        if self.peek() != char:
+            raise ValueError("Expected '{char}' at offset {offset}".format(char=char, offset=self.offset))
+        self.advance()
+
+    def decode(self):
+        """
+        Decodes the value at the reader's position, reading more chunks until it's complete.
+        Returns:
+            The decoded value
+        Raises:
+            ValueError: if the value isn't valid JSON
+        """
+        if self.peek() in NUMBER_CHARS:
+            self._read_number()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except ValueError:
+                # The value may just be cut off at the end of the buffer, read at least as much again before retrying
+                # so long values are decoded in a number of attempts logarithmic in their length
+                if self._exhausted or not self._fill(len(self._buffer) - self._position):
+                    raise
+                continue
+            self._position = end
+            return value
+
+    def _read_number(self):
+        """
+        Reads chunks until the number at the reader's position is followed by another character, as a number cut off
+        at the end of the buffer would otherwise decode as a different number.
+        """
+        end = self._position
+        while True:
+            while end < len(self._buffer) and self._buffer[end] in NUMBER_CHARS:
+                end += 1
+            if end < len(self._buffer):
+                return
+            end -= self._position
+            if not self._fill():
+                return
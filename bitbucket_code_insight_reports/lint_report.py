@@ -0,0 +1,186 @@
+"""
+Module which converts the line based output of linters such as flake8, pylint, eslint and shellcheck to reports
+"""
+import re
+from sys import intern
+
+from .annotation import Annotation
+from .report import Report
+
+# Entry point group other packages register further parsers in, each entry point resolving to a LineParser
+LINT_PARSERS_GROUP = "bitbucket_code_insight_reports.lint_parsers"
+
+
+class LineParser:
+    """
+    Converts single lines of linter output to annotations with a precompiled regular expression. The expression must
+    have `path`, `line` and `message` groups, and may have a `level` group which is looked up in the severities.
+    """
+
+    def __init__(self, pattern, severities=None, default_severity="MEDIUM"):
+        """
+        Compiles the parser.
+        Args:
+            pattern: regular expression matching a finding
+            severities: (optional) dictionary mapping the `level` group to the severity of the annotation
+            default_severity: (optional) severity of findings without a level, or with a level not in the severities
+        """
+        self.pattern = re.compile(pattern)
+        self.severities = severities if severities is not None else {}
+        self.default_severity = default_severity
+
+    def parse(self, line):
+        """
+        Converts a line of linter output to an annotation.
+        Args:
+            line: line of output, with or without its line break
+        Returns:
+            Annotation, or None if the line isn't a finding
+        """
+        match = self.pattern.match(line)
+        if match is None:
+            return None
+        path = match.group("path")
+        if path.startswith("./"):
+            path = path[2:]
+        level = match.group("level") if "level" in self.pattern.groupindex else None
+        return Annotation(
+            intern(path),
+            int(match.group("line")),
+            match.group("message"),
+            self.severities.get(level, self.default_severity),
+        )
+
+
+# The default output formats of flake8 and pylint, eslint's `unix` formatter and shellcheck's `gcc` format
+LINT_PARSERS = {
+    "flake8": LineParser(
+        r"(?P<path>[^:\n]+):(?P<line>\d+):\d+: (?P<message>(?P<level>[A-Z])\d+ [^\n]*)",
+        {"F": "HIGH", "E": "MEDIUM", "W": "LOW", "C": "LOW"},
+    ),
+    "pylint": LineParser(
+        r"(?P<path>[^:\n]+):(?P<line>\d+):\d+: (?P<message>(?P<level>[A-Z])\d{4}: [^\n]*)",
+        {"F": "HIGH", "E": "HIGH", "W": "MEDIUM", "R": "LOW", "C": "LOW", "I": "LOW"},
+    ),
+    "eslint": LineParser(
+        r"(?P<path>[^:\n]+):(?P<line>\d+):\d+: (?P<message>[^\n]* \[(?P<level>Error|Warning)(?:/[^\]\n]+)?\])",
+        {"Error": "HIGH", "Warning": "MEDIUM"},
+    ),
+    "shellcheck": LineParser(
+        r"(?P<path>[^:\n]+):(?P<line>\d+):\d+: (?P<level>error|warning|note|style): (?P<message>[^\n]*)",
+        {"error": "HIGH", "warning": "MEDIUM", "note": "LOW", "style": "LOW"},
+    ),
+}
+
+
+def _lint_parser_entry_points():
+    """
+    Finds the parsers registered by other packages, without loading them.
+    Returns:
+        Dictionary mapping parser names to their entry points
+    """
+    try:
+        from importlib.metadata import entry_points  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        # importlib.metadata is only available from Python 3.8
+        import pkg_resources  # pylint: disable=import-outside-toplevel
+
+        return {entry_point.name: entry_point for entry_point in pkg_resources.iter_entry_points(LINT_PARSERS_GROUP)}
+
+    all_entry_points = entry_points()
+    if hasattr(all_entry_points, "select"):
+        group = all_entry_points.select(group=LINT_PARSERS_GROUP)
+    else:
+        group = all_entry_points.get(LINT_PARSERS_GROUP, [])
+    return {entry_point.name: entry_point for entry_point in group}
+
+
+def get_lint_parser(name):
+    """
+    Looks up a linter's parser, only searching the installed packages if it isn't one of the built in parsers.
+    Args:
+        name: name of the linter
+    Returns:
+        LineParser for the linter
+    Raises:
+        ValueError: if there is no parser for the linter
+    """
+    if name in LINT_PARSERS:
+        return LINT_PARSERS[name]
+    entry_points = _lint_parser_entry_points()
+    if name not in entry_points:
+        raise ValueError(
+            "Unknown linter: {name}, expected one of {linters}".format(
+                name=name, linters=", ".join(sorted(set(LINT_PARSERS) | set(entry_points)))
+            )
+        )
+    return entry_points[name].load()
+
+
+class LintReport(Report):
+    """
+    Converts linter output into a report for BitBucket Server Code Insights, failing if there are any findings
+    """
+
+    def __init__(
+        self,
+        auth,
+        base_url,
+        project_key,
+        repo_slug,
+        commit_id,
+        key,
+        title,
+        description,
+        linter,
+        file_name="-",
+        force_pass=False,
+        **kwargs
+    ):
+        """
+        Reads the linter output and sets up the report from it, see `Report` for the common arguments.
+        Args:
+            linter: name of the linter which produced the output, see `get_lint_parser`
+            file_name: (optional) file to read the linter output from, `-` for stdin
+        """
+        self.parser = get_lint_parser(linter)
+
+        super().__init__(
+            auth,
+            base_url,
+            project_key,
+            repo_slug,
+            commit_id,
+            key,
+            title,
+            description,
+            "PASS",
+            file_name=file_name,
+            force_pass=force_pass,
+            **kwargs
+        )
+
+        if self.annotations and not force_pass:
+            self.result = "FAIL"
+            self.return_code = 1
+
+    def _process_annotations(self, annotations_string):
+        """
+        Converts linter output to annotations.
+        Args:
+            annotations_string: linter output to parse
+        Returns:
+            List of Annotations.
+        """
+        return self._process_annotations_file(annotations_string.splitlines())
+
+    def _process_annotations_file(self, report_file):
+        """
+        Converts linter output to annotations, reading it one line at a time and skipping lines which aren't findings.
+        Args:
+            report_file: open file (or any iterable of lines) containing the linter output
+        Returns:
+            List of Annotations.
+        """
+        parse = self.parser.parse
+        return [annotation for annotation in map(parse, report_file) if annotation is not None]
@@ -0,0 +1,179 @@
+"""
+Module which runs several reports for one commit from a YAML or JSON manifest
+"""
+import json
+import sys
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .factory import create_report
+
+# Options which may be set per report in the manifest, all other options are shared from the command line
+MANIFEST_OPTIONS = [
+    "report_type",
+    "report_key",
+    "report_title",
+    "report_desc",
+    "file",
+    "force_pass",
+    "status",
+    "annotations",
+    "dict",
+    "dict_index",
+    "linter",
+    "file_list",
+    "file_list_from_file",
+    "jobs",
+    "max_annotations",
+    "diff_file",
+    "base_ref",
+    "base_url",
+    "project_key",
+    "repo_slug",
+    "commit",
+]
+REQUIRED_MANIFEST_OPTIONS = ["report_type", "report_key", "report_title", "report_desc"]
+
+
+def load_manifest(file_name):
+    """
+    Loads the report entries from a manifest file.
+    The manifest is either a list of reports or a mapping with the list under the `reports` key, each report using the
+    same option names as the command line (e.g. `report_type`, `report_key`, `file_list`).
+    Args:
+        file_name: path to the manifest, YAML is used for `.yaml`/`.yml` files and JSON otherwise
+    Returns:
+        List of dictionaries, one for each report
+    Raises:
+        ValueError: if the manifest is malformed
+    """
+    with open(file_name, mode="r") as manifest_file:
+        if file_name.endswith((".yaml", ".yml")):
+            try:
+                import yaml  # pylint: disable=import-outside-toplevel
+            except ImportError as error:
+                raise ValueError(
+                    "PyYAML must be installed to read YAML manifests, e.g. with the yaml extra."
+                ) from error
+            manifest = yaml.safe_load(manifest_file)
+        else:
+            manifest = json.load(manifest_file)
+
+    if isinstance(manifest, dict):
+        manifest = manifest.get("reports")
+    if not isinstance(manifest, list):
+        raise ValueError("The manifest must contain a list of reports.")
+
+    for entry in manifest:
+        unknown = sorted(set(entry) - set(MANIFEST_OPTIONS))
+        if unknown:
+            raise ValueError("Unknown options in manifest entry: {options}".format(options=", ".join(unknown)))
+        missing = [option for option in REQUIRED_MANIFEST_OPTIONS if option not in entry]
+        if missing:
+            raise ValueError("Manifest entry is missing: {options}".format(options=", ".join(missing)))
+    return manifest
+
+
+def build_options(args, entry):
+    """
+    Combines the shared command line options with the options of a single manifest entry.
+    Args:
+        args: argparse.Namespace from the command line
+        entry: dictionary of options for one report
+    Returns:
+        argparse.Namespace with the options for the report
+    """
+    options = vars(args).copy()
+    # Open files can't be shared with worker processes, manifest entries name the file instead
+    options["file_list_from_file"] = None
+    options["file_list"] = None
+    # The reports are already built in parallel, entries can still ask for more processes for themselves
+    options["jobs"] = 1
+    options.update(entry)
+    if isinstance(options["dict"], str):
+        options["dict"] = [options["dict"]]
+    return Namespace(**options)
+
+
+def run_manifest(auth, args, session):
+    """
+    Builds every report in the manifest in a pool of worker processes and uploads them over the shared session.
+    Args:
+        auth: Authentication tuple for BitBucket
+        args: argparse.Namespace from the command line
+        session: requests.Session shared by all the uploads
+    Returns:
+        Aggregated return code, the highest return code of all the reports
+    """
+    try:
+        entries = load_manifest(args.manifest)
+    except (OSError, ValueError) as error:
+        print(error, file=sys.stderr)
+        return 1
+
+    all_options = [build_options(args, entry) for entry in entries]
+
+    if args.jobs > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = list(executor.map(_build_report, [auth] * len(all_options), all_options))
+    else:
+        results = [_build_report(auth, options) for options in all_options]
+
+    return_code = 0
+    reports = []
+    for options, (report, error) in zip(all_options, results):
+        if error is not None:
+            print("{key}: {error}".format(key=options.report_key, error=error), file=sys.stderr)
+            return_code = max(return_code, 1)
+        else:
+            report.session = session
+            reports.append(report)
+
+    # The session's connection pool is sized for `jobs` reports uploading at once
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        upload_results = list(executor.map(lambda report: publish(report, args), reports))
+
+    for report, upload_errors in zip(reports, upload_results):
+        if not args.silent:
+            print(report.output_info())
+        else:
+            for error in upload_errors:
+                print("Upload failed: {error}".format(error=error), file=sys.stderr)
+        return_code = max(return_code, report.return_code)
+
+    return return_code
+
+
+def _build_report(auth, options):
+    """
+    Builds a single report, returning errors rather than raising them so one bad entry doesn't stop the others.
+    Args:
+        auth: Authentication tuple for BitBucket
+        options: argparse.Namespace with the options for the report
+    Returns:
+        Tuple of the report (or None) and the error message (or None)
+    """
+    try:
+        return create_report(auth, options), None
+    except Exception as error:  # pylint: disable=broad-except
+        return None, str(error)
+
+
+def publish(report, args):
+    """
+    Uploads the report and its annotations, as requested on the command line.
+    Args:
+        report: Report to upload
+        args: argparse.Namespace from the command line, `upload_workers` sets the number of requests sent in parallel,
+            `sync` only uploads the annotations which changed since the last run (see `Report.sync_annotations`) and
+            `targets` lists further commits to upload to (see `Report.post_to_targets`)
+    Returns:
+        List of upload errors
+    """
+    if args.targets:
+        targets = [(args.project_key, args.repo_slug, args.commit)] + list(args.targets)
+        return report.post_to_targets(targets, workers=args.upload_workers)
+    report.post_base_report()
+    if args.sync:
+        return report.sync_annotations(workers=args.upload_workers)
+    return report.post_annotations(workers=args.upload_workers)
@@ -2,9 +2,97 @@
 
 """Main module."""
 import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import StringIO
+from itertools import chain
 
 import requests
 
+from .annotation import SEVERITIES, cap_annotations, count_annotations, parse_annotation, serialize_batch
+from .json_stream import ITEM, READ_SIZE, iter_values, read_chunks
+from .session import create_session, DEFAULT_UPLOAD_WORKERS, MAX_ANNOTATIONS_PER_REQUEST, MAX_DATA_FIELDS
+from .unified_diff import in_ranges
+
+# Number of annotation IDs to delete per request, keeping the query string a reasonable length
+DELETE_IDS_PER_REQUEST = 100
+ANNOTATIONS_PATH = ("annotations", ITEM)
+# Number of files listed in the data field of the most annotated files
+TOP_FILES = 3
+
+
+def split_batches(annotations, batch_size):
+    """
+    Splits annotations into the batches they're uploaded in.
+    Args:
+        annotations: list of annotations
+        batch_size: maximum number of annotations in a batch
+    Returns:
+        List of batches
+    """
+    return [annotations[start : start + batch_size] for start in range(0, len(annotations), batch_size)]
+
+
+def batch_errors(batches, results):
+    """
+    Describes the batches which failed to upload.
+    Args:
+        batches: list of batches, as returned by `split_batches`
+        results: None or an error string for each batch
+    Returns:
+        List of error strings, one for each batch which failed to upload.
+    """
+    errors = []
+    first = 0
+    for index, (batch, error) in enumerate(zip(batches, results)):
+        if error is not None:
+            errors.append(
+                "Batch {index} (annotations {first}-{last}): {error}".format(
+                    index=index, first=first, last=first + len(batch) - 1, error=error
+                )
+            )
+        first += len(batch)
+    return errors
+
+
+def _severity_text(severity_counts):
+    """
+    Describes the number of annotations of each severity, for a TEXT data field.
+    Args:
+        severity_counts: dictionary counting the annotations of each severity
+    Returns:
+        String such as "HIGH: 1, MEDIUM: 0, LOW: 4"
+    """
+    return ", ".join(
+        "{severity}: {count}".format(severity=severity, count=severity_counts.get(severity, 0))
+        for severity in reversed(SEVERITIES)
+    )
+
+
+def _target_error(target, error):
+    """
+    Prefixes an upload error with the target it happened for.
+    Args:
+        target: tuple of the project key, repository slug and commit ID
+        error: error string
+    Returns:
+        Error string
+    """
+    return "{project}/{repo}@{commit}: {error}".format(project=target[0], repo=target[1], commit=target[2], error=error)
+
+
+def _on_changed_line(changed_lines, annotation):
+    """
+    Checks whether an annotation is on one of the changed lines.
+    Args:
+        changed_lines: dictionary mapping paths to changed line ranges
+        annotation: Annotation to check
+    Returns:
+        True if the annotation is on a changed line
+    """
+    return isinstance(annotation.line, int) and in_ranges(changed_lines.get(annotation.path, []), annotation.line)
+
 
 class Report:
     """
@@ -26,6 +114,11 @@ class Report:
         return_code=None,
         file_name=None,
         force_pass=False,
+        session=None,
+        max_annotations=None,
+        changed_lines=None,
+        files_scanned=None,
+        tool_duration=None,
     ):
         """
         Sets up the BitBucket code insights report
@@ -41,21 +134,40 @@ class Report:
             result: result to use for the report (PASS/FAIL)
             annotations_string: (optional) JSON string of annotations for the report
             return_code: (optional) return code to return from the tool
-            file_name: (optional) file name to read results from
+            file_name: (optional) file name to read results from, `-` for stdin
             force_pass: (optional) Boolean, true to force setting the result to PASS and the return_code to 0 (for use in non-blocking CI steps)
+            session: (optional) requests.Session to upload with, allows sharing one connection pool between reports
+            max_annotations: (optional) maximum number of annotations to keep, the rest are only counted in the
+                report's data fields (see `cap_annotations` for which are kept)
+            changed_lines: (optional) dictionary mapping paths to changed line ranges, annotations on changed lines are
+                kept first
+            files_scanned: (optional) number of files the tool checked, shown in the report's data fields
+            tool_duration: (optional) seconds the tool took to run, shown in the report's data fields
         """
         self.auth = auth
+        self.session = session if session is not None else create_session()
         self.title = title
         self.description = description
 
         self._check_return_and_result(force_pass, return_code, result)
 
-        if file_name is not None:
+        self.base_url = base_url
+        self.key = key
+        self.url = self._build_base_report_url(base_url, project_key, repo_slug, commit_id, key)
+
+        if file_name == "-":
+            self.annotations = self._process_annotations_file(sys.stdin)
+        elif file_name is not None:
             with open(file_name, mode="r") as report_file:
-                annotations_string = report_file.read()
+                self.annotations = self._process_annotations_file(report_file)
+        else:
+            self.annotations = self._process_annotations(annotations_string)
+        self.upload_errors = []
 
-        self.url = self._build_base_report_url(base_url, project_key, repo_slug, commit_id, key)
-        self.annotations = self._process_annotations(annotations_string)
+        severity_counts, path_counts = count_annotations(self.annotations)
+        self.data = self._summary_data(severity_counts, path_counts, files_scanned, tool_duration)
+        if max_annotations is not None:
+            self._cap_annotations(max_annotations, changed_lines, severity_counts)
 
     def _check_return_and_result(self, force_pass, return_code, result):
         """
@@ -112,26 +224,255 @@ class Report:
         """
         Publishes the report (without annotations)
         """
+        self.session.put(self.url, json=self._base_report_body(), auth=self.auth)
+
+    def _base_report_body(self):
+        """
+        Returns the body of the request creating the report.
+        """
         body = {"title": self.title, "details": self.description, "result": self.result}
-        requests.put(self.url, json=body, auth=self.auth)
+        if self.data:
+            body["data"] = self.data[:MAX_DATA_FIELDS]
+        return body
 
     @staticmethod
-    def _process_annotations(annotations_string):
+    def _summary_data(severity_counts, path_counts, files_scanned=None, tool_duration=None):
+        """
+        Builds the data fields summarizing the annotations, so the totals are shown without opening them all.
+        Args:
+            severity_counts: dictionary counting the annotations of each severity
+            path_counts: dictionary counting the annotations on each path
+            files_scanned: (optional) number of files the tool checked, left out if not known
+            tool_duration: (optional) seconds the tool took to run, left out if not known
+        Returns:
+            List of data fields
+        """
+        data = [{"title": "Annotations by severity", "type": "TEXT", "value": _severity_text(severity_counts)}]
+        if files_scanned is not None:
+            data.append({"title": "Files scanned", "type": "NUMBER", "value": files_scanned})
+        if path_counts:
+            top_files = sorted(path_counts.items(), key=lambda item: (-item[1], item[0]))[:TOP_FILES]
+            data.append(
+                {
+                    "title": "Most annotated files",
+                    "type": "TEXT",
+                    "value": ", ".join("{path}: {count}".format(path=path, count=count) for path, count in top_files),
+                }
+            )
+        if tool_duration is not None:
+            data.append({"title": "Tool duration", "type": "DURATION", "value": int(round(tool_duration * 1000))})
+        return data
+
+    def _cap_annotations(self, max_annotations, changed_lines=None, severity_counts=None):
         """
-        Converts the annotations string provided to a dictionary
+        Drops the least important annotations beyond the maximum, adding data fields counting the dropped ones.
         Args:
-            annotations_string: annotations to load
+            max_annotations: maximum number of annotations to keep
+            changed_lines: (optional) dictionary mapping paths to changed line ranges
+            severity_counts: (optional) number of annotations of each severity, see `count_annotations`
+        """
+        is_changed = partial(_on_changed_line, changed_lines) if changed_lines else None
+        self.annotations, dropped = cap_annotations(self.annotations, max_annotations, is_changed, severity_counts)
+        if dropped:
+            self.data.append({"title": "Annotations not shown", "type": "NUMBER", "value": sum(dropped.values())})
+            self.data.append({"title": "Not shown by severity", "type": "TEXT", "value": _severity_text(dropped)})
+
+    def _process_annotations(self, annotations_string):
+        """
+        Converts the annotations string provided to a list of annotations
+        Args:
+            annotations_string: annotations to load, see `_process_annotations_file` for the formats
         Returns:
-            Dictionary with the annotations.
+            List of Annotations.
         """
-        return json.loads(annotations_string)
+        return self._process_annotations_file(StringIO(annotations_string))
 
-    def post_annotations(self):
+    def _process_annotations_file(self, report_file):
         """
-        Publishes the annotations to the report.
+        Reads annotations from a JSON document in the format of the BitBucket API, `{"annotations": [...]}`, or from
+        JSON Lines with one annotation per line. The input is read incrementally and each annotation is converted and
+        validated as soon as it's read, so the whole document is never held in memory. Report types override this
+        to parse the output of their tools.
+        Args:
+            report_file: open file to read the annotations from
+        Returns:
+            List of Annotations.
+        Raises:
+            ValueError: if the input isn't valid JSON or an annotation is invalid
+        """
+        # Only a bounded prefix is sniffed, documents written on a single line would otherwise be decoded whole here
+        first_line = report_file.readline(READ_SIZE)
+        try:
+            first_value = json.loads(first_line)
+        except ValueError:
+            first_value = None
+
+        if isinstance(first_value, dict) and "message" in first_value:
+            values = chain([first_value], (json.loads(line) for line in report_file if line.strip()))
+        else:
+            chunks = chain([first_line], read_chunks(report_file))
+            values = (value for _, value in iter_values(chunks, [ANNOTATIONS_PATH]))
+        return [parse_annotation(value, index) for index, value in enumerate(values)]
+
+    def post_annotations(self, batch_size=MAX_ANNOTATIONS_PER_REQUEST, workers=DEFAULT_UPLOAD_WORKERS):
+        """
+        Publishes the annotations to the report, split into batches which are uploaded concurrently.
+        Args:
+            batch_size: (optional) maximum number of annotations to send per request
+            workers: (optional) number of batches to upload in parallel
+        Returns:
+            List of error strings, one for each batch which failed to upload.
+        """
+        self.upload_errors = self._post_annotation_batches(self._identified_annotations(), batch_size, workers)
+        return self.upload_errors
+
+    def sync_annotations(self, batch_size=MAX_ANNOTATIONS_PER_REQUEST, workers=DEFAULT_UPLOAD_WORKERS):
+        """
+        Publishes only the difference between the annotations and those already on the report, as left by an earlier
+        run for the same commit. Annotations are matched by their `externalId`, a hash of their contents.
+        Args:
+            batch_size: (optional) maximum number of annotations to send per request
+            workers: (optional) number of batches to upload in parallel
+        Returns:
+            List of error strings, one for each request which failed.
+        """
+        annotations_url = self.url + "/annotations"
+        annotations = self._identified_annotations()
+
+        response, error = self._send("get", annotations_url)
+        try:
+            existing = response.json().get("annotations", []) if error is None else []
+        except ValueError as json_error:
+            error = str(json_error)
+        if error is not None:
+            self.upload_errors = ["Fetching existing annotations: {error}".format(error=error)]
+            return self.upload_errors
+
+        existing_ids = {annotation.get("externalId") for annotation in existing}
+        if None in existing_ids:
+            # Annotations uploaded without an ID can only be deleted together with all the others
+            stale_batches = [None]
+            existing_ids = set()
+        else:
+            stale = sorted(existing_ids - {external_id for external_id, _ in annotations})
+            stale_batches = [
+                stale[start : start + DELETE_IDS_PER_REQUEST] for start in range(0, len(stale), DELETE_IDS_PER_REQUEST)
+            ]
+
+        errors = []
+        for external_ids in stale_batches:
+            _, error = self._send("delete", annotations_url, params={"externalId": external_ids})
+            if error is not None:
+                errors.append("Deleting stale annotations: {error}".format(error=error))
+
+        new_annotations = [identified for identified in annotations if identified[0] not in existing_ids]
+        self.upload_errors = errors + self._post_annotation_batches(new_annotations, batch_size, workers)
+        return self.upload_errors
+
+    def post_to_targets(self, targets, batch_size=MAX_ANNOTATIONS_PER_REQUEST, workers=DEFAULT_UPLOAD_WORKERS):
+        """
+        Publishes the report and its annotations to several commits at once, e.g. both the head and the merge commit of
+        a pull request, or the same commit in mirrored repositories. Every request body is serialized once and sent as
+        is to each target.
+        Args:
+            targets: list of (project key, repository slug, commit ID) tuples
+            batch_size: (optional) maximum number of annotations to send per request
+            workers: (optional) number of requests to send in parallel, across all the targets
+        Returns:
+            List of error strings, each prefixed with the target it failed for.
+        """
+        headers = {"Content-Type": "application/json"}
+        report_body = json.dumps(self._base_report_body()).encode("utf-8")
+        batches = split_batches(self._identified_annotations(), batch_size)
+        batch_bodies = [serialize_batch(batch) for batch in batches]
+        urls = [self._build_base_report_url(self.base_url, *target, self.key) for target in targets]
+
+        def _put_report(url):
+            return self._send("put", url, data=report_body, headers=headers)[1]
+
+        def _post_batch(url_and_body):
+            url, body = url_and_body
+            return self._send("post", url + "/annotations", data=body, headers=headers)[1]
+
+        errors = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            created = list(executor.map(_put_report, urls))
+            uploads = [(target, url) for target, url, error in zip(targets, urls, created) if error is None]
+            results = list(executor.map(_post_batch, [(url, body) for _, url in uploads for body in batch_bodies]))
+
+        for target, error in zip(targets, created):
+            if error is not None:
+                errors.append(_target_error(target, "Creating report: {error}".format(error=error)))
+        for index, (target, _) in enumerate(uploads):
+            target_results = results[index * len(batches) : (index + 1) * len(batches)]
+            errors.extend(_target_error(target, error) for error in batch_errors(batches, target_results))
+        self.upload_errors = errors
+        return self.upload_errors
+
+    def _identified_annotations(self):
+        """
+        Pairs the annotations with the `externalId` they're uploaded with, dropping duplicates.
+        Returns:
+            List of tuples of the external ID and the Annotation
+        """
+        annotations = []
+        seen_ids = set()
+        for annotation in self.annotations:
+            external_id = annotation.external_id
+            if external_id not in seen_ids:
+                seen_ids.add(external_id)
+                annotations.append((external_id, annotation))
+        return annotations
+
+    def _post_annotation_batches(self, annotations, batch_size, workers):
+        """
+        Uploads annotations in batches, concurrently.
+        Args:
+            annotations: list of tuples of the external ID and the Annotation
+            batch_size: maximum number of annotations to send per request
+            workers: number of batches to upload in parallel
+        Returns:
+            List of error strings, one for each batch which failed to upload.
         """
         annotations_url = self.url + "/annotations"
-        requests.post(annotations_url, json=self.annotations, auth=self.auth)
+        batches = split_batches(annotations, batch_size)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(partial(self._post_annotation_batch, annotations_url), batches)
+            return batch_errors(batches, results)
+
+    def _post_annotation_batch(self, annotations_url, batch):
+        """
+        Uploads a single batch of annotations.
+        Args:
+            annotations_url: URL to post the annotations to
+            batch: list of tuples of the external ID and the Annotation
+        Returns:
+            None on success, otherwise a string describing the failure.
+        """
+        # Only the batches being uploaded are held serialized at a time
+        _, error = self._send(
+            "post", annotations_url, data=serialize_batch(batch), headers={"Content-Type": "application/json"}
+        )
+        return error
+
+    def _send(self, method, url, **kwargs):
+        """
+        Sends an authenticated request through the session.
+        Args:
+            method: name of the session method to call, e.g. "post"
+            url: URL to send the request to
+            kwargs: further arguments for the request
+        Returns:
+            Tuple of the response (None if it failed) and None or a string describing the failure.
+        """
+        try:
+            response = getattr(self.session, method)(url, auth=self.auth, **kwargs)
+        except requests.RequestException as error:
+            return None, str(error)
+        if not response.ok:
+            return None, "{status} {reason}".format(status=response.status_code, reason=response.reason)
+        return response, None
 
     def output_info(self):
         """
@@ -141,5 +482,11 @@ class Report:
         report_info += "Title: {title}\n".format(title=self.title)
         report_info += "Description: {desc}\n".format(desc=self.description)
         report_info += "Result: {result}\n".format(result=self.result)
-        report_info += "Annotations: {annot}\n".format(annot=json.dumps(self.annotations, indent=4, sort_keys=True))
+        report_info += "Annotations: {annot}\n".format(
+            annot=json.dumps(
+                {"annotations": [annotation.to_dict() for annotation in self.annotations]}, indent=4, sort_keys=True
+            )
+        )
+        for error in self.upload_errors:
+            report_info += "Upload failed: {error}\n".format(error=error)
         return report_info
@@ -0,0 +1,183 @@
+"""
+Module which converts SARIF files, the static analysis results format used by many scanners, to reports
+"""
+import os
+from io import StringIO
+from sys import intern
+from urllib.parse import unquote, urlparse
+
+from .annotation import Annotation
+from .json_stream import ITEM, iter_values, read_chunks
+from .report import Report
+
+TOOL_PATH = ("runs", ITEM, "tool")
+RESULT_PATH = ("runs", ITEM, "results", ITEM)
+# SARIF result levels and the severity of their annotations, results without a level default to warning
+SARIF_SEVERITIES = {"error": "HIGH", "warning": "MEDIUM", "note": "LOW", "none": "LOW"}
+DEFAULT_SARIF_LEVEL = "warning"
+# Kinds of results which aren't problems, e.g. a rule the scanner checked and found no problem with
+SKIPPED_SARIF_KINDS = {"pass", "notApplicable"}
+
+
+def _uri_to_path(uri):
+    """
+    Converts the URI of an artifact to a path, relative to the current directory if it's a file below it.
+    Args:
+        uri: artifact URI, e.g. `src/main.c` or `file:///home/user/repo/src/main.c`
+    Returns:
+        Path of the artifact
+    """
+    if uri.startswith("file:"):
+        path = unquote(urlparse(uri).path)
+    else:
+        path = unquote(uri)
+    if os.path.isabs(path):
+        relative = os.path.relpath(path)
+        if not relative.startswith(os.pardir):
+            path = relative
+    elif path.startswith("./"):
+        path = path[2:]
+    return path
+
+
+def _rule_levels(tool):
+    """
+    Reads the default level of each rule of a tool.
+    Args:
+        tool: SARIF tool object
+    Returns:
+        Tuple of the levels in rule order, for results referring to rules by index, and a dictionary mapping the rule
+        IDs to their levels
+    """
+    rules = tool.get("driver", {}).get("rules", [])
+    levels = [rule.get("defaultConfiguration", {}).get("level", DEFAULT_SARIF_LEVEL) for rule in rules]
+    return levels, {rule.get("id"): level for rule, level in zip(rules, levels)}
+
+
+def _is_suppressed(result):
+    """
+    Checks whether a SARIF result was suppressed, e.g. by an inline comment or a baseline. Suppressions which were
+    rejected don't count.
+    Args:
+        result: SARIF result object
+    Returns:
+        True if the result is suppressed
+    """
+    return any(suppression.get("status") != "rejected" for suppression in result.get("suppressions") or [])
+
+
+def _result_annotation(result, levels_by_index, levels_by_id):
+    """
+    Converts a SARIF result to an annotation on its first location.
+    Args:
+        result: SARIF result object
+        levels_by_index: default level of each rule of the run's tool, in rule order
+        levels_by_id: dictionary mapping the run's rule IDs to their default levels
+    Returns:
+        Annotation, or None if the result is suppressed or isn't a problem
+    """
+    kind = result.get("kind", "fail")
+    if kind in SKIPPED_SARIF_KINDS or _is_suppressed(result):
+        return None
+
+    rule_id = result.get("ruleId", result.get("rule", {}).get("id"))
+    level = result.get("level")
+    if level is None and kind != "fail":
+        # Only failures take their level from the rule, other kinds such as review default to none
+        level = "none"
+    if level is None:
+        rule_index = result.get("ruleIndex", result.get("rule", {}).get("index"))
+        if isinstance(rule_index, int) and 0 <= rule_index < len(levels_by_index):
+            level = levels_by_index[rule_index]
+        else:
+            level = levels_by_id.get(rule_id, DEFAULT_SARIF_LEVEL)
+
+    message = result.get("message", {})
+    message = message.get("text", message.get("markdown", message.get("id", "")))
+    if rule_id:
+        message = "{rule}: {message}".format(rule=rule_id, message=message)
+
+    path = None
+    line = None
+    locations = result.get("locations") or [{}]
+    physical_location = locations[0].get("physicalLocation", {})
+    uri = physical_location.get("artifactLocation", {}).get("uri")
+    if uri is not None:
+        path = intern(_uri_to_path(uri))
+        line = physical_location.get("region", {}).get("startLine")
+    return Annotation(path, line, message, SARIF_SEVERITIES.get(level, SARIF_SEVERITIES[DEFAULT_SARIF_LEVEL]))
+
+
+class SarifReport(Report):
+    """
+    Converts a SARIF file into a report for BitBucket Server Code Insights, failing if any result is an error
+    """
+
+    def __init__(
+        self,
+        auth,
+        base_url,
+        project_key,
+        repo_slug,
+        commit_id,
+        key,
+        title,
+        description,
+        file_name="-",
+        force_pass=False,
+        **kwargs
+    ):
+        """
+        Reads the SARIF file and sets up the report from it, see `Report` for the common arguments.
+        Args:
+            file_name: (optional) SARIF file to read, `-` for stdin
+        """
+        super().__init__(
+            auth,
+            base_url,
+            project_key,
+            repo_slug,
+            commit_id,
+            key,
+            title,
+            description,
+            "PASS",
+            file_name=file_name,
+            force_pass=force_pass,
+            **kwargs
+        )
+
+        if not force_pass and any(annotation.severity == "HIGH" for annotation in self.annotations):
+            self.result = "FAIL"
+            self.return_code = 1
+
+    def _process_annotations(self, annotations_string):
+        """
+        Converts a SARIF document to annotations.
+        Args:
+            annotations_string: SARIF document to parse
+        Returns:
+            List of Annotations.
+        """
+        return self._process_annotations_file(StringIO(annotations_string))
+
+    def _process_annotations_file(self, report_file):
+        """
+        Converts a SARIF document to annotations, one for each result which is a problem. The document is read incrementally, only the
+        tool of each run and one result at a time are decoded, so large files are never held in memory. Rule default
+        levels are taken from the tool, which SARIF writers put before the results of a run.
+        Args:
+            report_file: open file containing the SARIF document
+        Returns:
+            List of Annotations.
+        """
+        annotations = []
+        levels_by_index, levels_by_id = [], {}
+        for path, value in iter_values(read_chunks(report_file), [TOOL_PATH, RESULT_PATH]):
+            if path == TOOL_PATH:
+                levels_by_index, levels_by_id = _rule_levels(value)
+            else:
+                annotation = _result_annotation(value, levels_by_index, levels_by_id)
+                if annotation is not None:
+                    annotations.append(annotation)
+        return annotations
@@ -0,0 +1,48 @@
+"""
+Module which creates the HTTP session used to upload reports to BitBucket
+"""
+# BitBucket Server rejects requests containing more annotations than this
+MAX_ANNOTATIONS_PER_REQUEST = 1000
+# BitBucket Server keeps no more than this many annotations, and this many data fields, on a report
+MAX_ANNOTATIONS_PER_REPORT = 1000
+MAX_DATA_FIELDS = 6
+DEFAULT_UPLOAD_WORKERS = 4
+DEFAULT_POOL_SIZE = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def create_session(pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, backoff_factor=DEFAULT_BACKOFF_FACTOR):
+    """
+    Creates a keep-alive session with a sized connection pool which retries failed requests.
+    Args:
+        pool_size: (optional) maximum number of connections to keep open per host
+        retries: (optional) number of times to retry on connection errors, 429 and 5xx responses
+        backoff_factor: (optional) factor for the exponential delay between retries, in seconds
+    Returns:
+        requests.Session ready to be shared between reports
+    """
+    # Imported here so the CLI can parse its arguments, and show --help, without loading requests
+    import requests  # pylint: disable=import-outside-toplevel
+    from requests.adapters import HTTPAdapter  # pylint: disable=import-outside-toplevel
+    from urllib3.util.retry import Retry  # pylint: disable=import-outside-toplevel
+
+    retry_options = {
+        "total": retries,
+        "backoff_factor": backoff_factor,
+        "status_forcelist": RETRY_STATUS_CODES,
+        "raise_on_status": False,
+    }
+    # Retry every method, including POST - urllib3 renamed this option in 1.26
+    if hasattr(Retry, "DEFAULT_ALLOWED_METHODS"):
+        retry_options["allowed_methods"] = False
+    else:
+        retry_options["method_whitelist"] = False
+
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=Retry(**retry_options))
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -1,13 +1,37 @@
 """
 Spell checks files using scspell - https://github.com/myint/scspell/ - and reports the results to BitBucket Server Code Insights
 """
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import time
+from sys import intern
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import redirect_stderr
 from io import StringIO
+from itertools import repeat
 
+import scspell
 from scspell import spell_check
 
+from .annotation import Annotation
+from .cache import hash_file, hash_key
+from .dict_index import DictionaryIndex
 from .report import Report
 
+SHARDS_PER_JOB = 4
+# scspell findings, listing the words not found in either of its two formats. scspell also writes errors such as
+# unreadable files to the same stream, which don't match.
+FINDING_PATTERN = re.compile(
+    r"^(?P<path>[^:]*):(?P<line>\d+): (?P<message>(?P<words>'.*') "
+    r"(?:not found in dictionary|were not found in the dictionary) (?P<token>\(from token .*\)))$"
+)
+FINDING_WORD_PATTERN = re.compile(r"'([^']*)'")
+# File IDs, which select a file's own dictionary, as scspell finds them in the file
+FILE_ID_PATTERN = re.compile(scspell.FILE_ID_REGEX.pattern.encode("ascii"))
+
 
 class SpellCheckReport(Report):
     """
@@ -27,16 +51,28 @@ class SpellCheckReport(Report):
         files_to_check,
         dictionaries=None,
         force_pass=False,
+        jobs=1,
+        cache=None,
+        changed_lines=None,
+        dict_index=None,
+        **kwargs
     ):  # pylint: disable=too-many-locals
-        results = StringIO()
-
         if dictionaries is None:
             dictionaries = []
 
-        with redirect_stderr(results):
-            return_code = spell_check(files_to_check, report_only=True, base_dicts=dictionaries)
-
-        annotations_string = results.getvalue().strip()
+        start = time.perf_counter()
+        if changed_lines is not None:
+            files_to_check = _files_with_changes(files_to_check, changed_lines)
+            return_code, annotations_string = self._check_changed_lines(
+                files_to_check, changed_lines, dictionaries, jobs, cache
+            )
+        else:
+            return_code, annotations_string = self._check_any_files(files_to_check, dictionaries, jobs, cache)
+        if dict_index is not None:
+            with DictionaryIndex(dict_index) as index:
+                annotations_string = _filter_known_words(annotations_string, index)
+            return_code = return_code or not annotations_string
+        tool_duration = time.perf_counter() - start
 
         if return_code:
             result = "PASS"
@@ -55,28 +91,309 @@ class SpellCheckReport(Report):
             result,
             annotations_string=annotations_string,
             force_pass=force_pass,
+            changed_lines=changed_lines,
+            files_scanned=len(files_to_check),
+            tool_duration=tool_duration,
+            **kwargs
+        )
+
+    @classmethod
+    def _check_any_files(cls, files_to_check, dictionaries, jobs, cache):
+        """
+        Spell checks the files, through the cache if there is one.
+        Args:
+            files_to_check: list of files to spell check
+            dictionaries: list of paths to dictionaries to use
+            jobs: number of worker processes to use
+            cache: ResultCache to use, or None
+        Returns:
+            Tuple of whether all the files passed and the combined scspell output
+        """
+        if cache is not None:
+            return cls._check_files_cached(files_to_check, dictionaries, jobs, cache)
+        return cls._check_files(files_to_check, dictionaries, jobs)
+
+    @classmethod
+    def _check_changed_lines(cls, files_to_check, changed_lines, dictionaries, jobs, cache):
+        """
+        Spell checks only the changed lines of the files.
+        Copies of the files are checked with every unchanged line blanked out, which keeps the line numbers the same
+        while leaving scspell nothing to tokenize outside of the changes.
+        Args:
+            files_to_check: list of files to spell check, or None to check every file changed in the diff
+            changed_lines: dictionary mapping paths to sorted lists of inclusive (first, last) changed line ranges
+            dictionaries: list of paths to dictionaries to use
+            jobs: number of worker processes to use
+            cache: ResultCache to use, or None
+        Returns:
+            Tuple of whether all the changed lines passed and the combined scspell output
+        """
+        changed_lines = {os.path.normpath(path): ranges for path, ranges in changed_lines.items()}
+        files_to_check = _files_with_changes(files_to_check, changed_lines)
+
+        with tempfile.TemporaryDirectory() as masked_dir:
+            masked_files = []
+            for index, path in enumerate(files_to_check):
+                # Keep the file name so scspell still picks the dictionaries for the file type
+                masked_path = os.path.join(masked_dir, str(index), os.path.basename(path))
+                _mask_unchanged_lines(path, masked_path, changed_lines[os.path.normpath(path)])
+                masked_files.append(masked_path)
+
+            okay, output = cls._check_any_files(masked_files, dictionaries, jobs, cache)
+
+        output = "\n".join(
+            path + ":" + finding
+            for path, (_, file_findings) in zip(files_to_check, _split_output_by_file(masked_files, output))
+            for finding in file_findings
         )
+        return okay, output
 
     @staticmethod
-    def _process_annotations(annotations_string):
+    def _check_files(files_to_check, dictionaries, jobs):
         """
-        Converts the output from scspell to an annotations dictionary.
+        Spell checks the files, sharding them across worker processes when more than one job is requested.
+        Args:
+            files_to_check: list of files to spell check
+            dictionaries: list of paths to dictionaries to use
+            jobs: number of worker processes to use
+        Returns:
+            Tuple of whether all the files passed and the combined scspell output
+        """
+        if jobs > 1 and len(files_to_check) > 1:
+            # Several small shards per worker keep the workers busy when some files are slower than others
+            shard_size = -(-len(files_to_check) // (jobs * SHARDS_PER_JOB))
+            shards = [files_to_check[start : start + shard_size] for start in range(0, len(files_to_check), shard_size)]
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                # map returns the results in shard order, so the output is the same as a serial run
+                results = list(executor.map(_spell_check_shard, shards, repeat(dictionaries)))
+        else:
+            results = [_spell_check_shard(files_to_check, dictionaries)]
+
+        okay = all(shard_okay for shard_okay, _ in results)
+        output = "\n".join(shard_output for _, shard_output in results if shard_output)
+        return okay, output
+
+    @classmethod
+    def _check_files_cached(cls, files_to_check, dictionaries, jobs, cache):
+        """
+        Spell checks the files, answering unchanged files from the cache and only running scspell on the rest.
+        Results are keyed by the file contents, extension and file ID together with the dictionaries, including
+        scspell's main dictionary, and scspell version, so they are reused for files of the same type whatever their
+        path is.
+        Args:
+            files_to_check: list of files to spell check
+            dictionaries: list of paths to dictionaries to use
+            jobs: number of worker processes to use
+            cache: ResultCache to read and store results in
+        Returns:
+            Tuple of whether all the files passed and the combined scspell output
+        """
+        dictionaries_hash = hash_key(
+            scspell.__version__, _main_dictionary_hash(), *[hash_file(dictionary) for dictionary in dictionaries]
+        )
+
+        keys = {}
+        findings = {}
+        for path in files_to_check:
+            try:
+                keys[path] = _cache_key(dictionaries_hash, path)
+            except OSError:
+                # Leave unreadable files for scspell to report
+                continue
+            cached = cache.get(keys[path])
+            if cached is not None:
+                findings[path] = cached
+
+        cached_okay = not any(findings.values())
+        unchecked = [path for path in files_to_check if path not in findings]
+        okay, output = cls._check_files(unchecked, dictionaries, jobs) if unchecked else (True, "")
+
+        for path, file_findings in _split_output_by_file(unchecked, output):
+            findings[path] = file_findings
+            if path in keys:
+                cache.put(keys[path], file_findings)
+        cache.prune()
+
+        output = "\n".join(path + ":" + finding for path in files_to_check for finding in findings.get(path, []))
+        return okay and cached_okay, output
+
+    def _process_annotations(self, annotations_string):
+        """
+        Converts the output from scspell to annotations.
         Args:
             annotations_string: scspell output to parse
         Returns:
-            Dictionary with the annotations.
+            List of Annotations.
+        """
+        return self._process_annotations_file(annotations_string.split("\n"))
+
+    def _process_annotations_file(self, report_file):
+        """
+        Converts the output from scspell to annotations, reading it one line at a time. Lines which aren't findings,
+        such as errors about files scspell couldn't read, are passed on to stderr.
+        Args:
+            report_file: open file (or any iterable of lines) containing the scspell output
+        Returns:
+            List of Annotations.
         """
         annotations = []
 
-        if annotations_string != "":
-            for issue in annotations_string.split("\n"):
-                issue = issue.split(":")
+        for issue in report_file:
+            issue = issue.rstrip("\n")
+            if issue == "":
+                continue
+            match = FINDING_PATTERN.match(issue)
+            if match is None:
+                print("scspell: {issue}".format(issue=issue), file=sys.stderr)
+                continue
+            annotations.append(
+                Annotation(intern(match.group("path").strip()), int(match.group("line")), match.group("message"), "LOW")
+            )
+        return annotations
+
 
-                # Handle cases where the word has a colon
-                if len(issue) > 3:
-                    issue[2] = ":".join(issue[2:])
+def _files_with_changes(files_to_check, changed_lines):
+    """
+    Lists the files which have changed lines and still exist.
+    Args:
+        files_to_check: list of files to spell check, or None for every file changed in the diff
+        changed_lines: dictionary mapping paths to changed line ranges
+    Returns:
+        List of files to spell check
+    """
+    changed_paths = [os.path.normpath(path) for path in changed_lines]
+    if files_to_check is None:
+        files_to_check = changed_paths
+    changed_paths = set(changed_paths)
+    return [path for path in files_to_check if os.path.normpath(path) in changed_paths and os.path.isfile(path)]
+
+
+def _main_dictionary_hash():
+    """
+    Hashes scspell's main dictionary, which it checks every file against besides the dictionaries passed to it.
+    Returns:
+        Hex digest of the dictionary, or an empty string if there is none for scspell to read
+    """
+    try:
+        return hash_file(scspell.find_dict_file(None))
+    except OSError:
+        return ""
+
+
+def _cache_key(dictionaries_hash, path):
+    """
+    Builds the cache key of a file's scspell results. Besides the contents, the results depend on the extension and
+    file ID of the file, which pick the file type and file ID dictionaries scspell checks it against.
+    Args:
+        dictionaries_hash: key of the dictionaries and scspell version
+        path: file to spell check
+    Returns:
+        Cache key
+    """
+    with open(path, mode="rb") as source_file:
+        contents = source_file.read()
+    file_id = FILE_ID_PATTERN.search(contents)
+    return hash_key(
+        dictionaries_hash,
+        os.path.splitext(path.lower())[1],
+        file_id.group(1).decode("ascii") if file_id is not None else "",
+        hashlib.sha256(contents).hexdigest(),
+    )
 
-                annotations.append(
-                    {"path": issue[0].strip(), "line": issue[1].strip(), "message": issue[2].strip(), "severity": "LOW"}
+
+def _filter_known_words(output, index):
+    """
+    Removes the words found in a dictionary index from scspell findings, dropping findings left without any words.
+    Args:
+        output: scspell output
+        index: DictionaryIndex of further words to accept
+    Returns:
+        The remaining scspell output
+    """
+    findings = []
+    for finding in output.split("\n") if output else []:
+        match = FINDING_PATTERN.match(finding)
+        if match is None:
+            findings.append(finding)
+            continue
+        words = FINDING_WORD_PATTERN.findall(match.group("words"))
+        unknown = [word for word in words if not index.match(word)]
+        if len(unknown) == len(words):
+            findings.append(finding)
+        elif len(unknown) == 1:
+            findings.append(
+                "{path}:{line}: '{word}' not found in dictionary {token}".format(
+                    path=match.group("path"), line=match.group("line"), word=unknown[0], token=match.group("token")
+                )
+            )
+        elif unknown:
+            findings.append(
+                "{path}:{line}: {words} were not found in the dictionary {token}".format(
+                    path=match.group("path"),
+                    line=match.group("line"),
+                    words=", ".join("'{word}'".format(word=word) for word in unknown),
+                    token=match.group("token"),
                 )
-        return {"annotations": annotations}
+            )
+    return "\n".join(findings)
+
+
+def _spell_check_shard(files_to_check, dictionaries):
+    """
+    Runs scspell over a list of files, capturing its report.
+    Args:
+        files_to_check: list of files to spell check
+        dictionaries: list of paths to dictionaries to use
+    Returns:
+        Tuple of whether all the files passed and the scspell output
+    """
+    results = StringIO()
+    with redirect_stderr(results):
+        okay = spell_check(files_to_check, report_only=True, base_dicts=dictionaries)
+    return okay, results.getvalue().strip()
+
+
+def _split_output_by_file(files_checked, output):
+    """
+    Splits scspell output into the findings for each file. Lines which aren't findings of one of the files, such as
+    errors about files scspell couldn't read, are skipped without affecting the findings of the other files.
+    Args:
+        files_checked: list of files passed to scspell
+        output: scspell output
+    Yields:
+        Tuple of the file path and the list of its findings, with the path prefix removed
+    """
+    findings = {path: [] for path in files_checked}
+    for line in output.split("\n") if output else []:
+        match = FINDING_PATTERN.match(line)
+        if match is not None and match.group("path") in findings:
+            findings[match.group("path")].append(line[len(match.group("path")) + 1 :])
+    for path in files_checked:
+        yield path, findings[path]
+
+
+def _mask_unchanged_lines(source_path, masked_path, ranges):
+    """
+    Writes a copy of a file with every line outside of the given ranges replaced by an empty line. Only the file ID is
+    kept of an unchanged line holding it, so scspell still checks the changed lines against the file's dictionary.
+    Args:
+        source_path: file to copy
+        masked_path: path to write the copy to
+        ranges: sorted list of inclusive (first, last) line ranges to keep
+    """
+    os.makedirs(os.path.dirname(masked_path), exist_ok=True)
+    range_index = 0
+    found_file_id = False
+    with open(source_path, mode="rb") as source_file, open(masked_path, mode="wb") as masked_file:
+        for line_number, line in enumerate(source_file, 1):
+            while range_index < len(ranges) and ranges[range_index][1] < line_number:
+                range_index += 1
+            # scspell only uses the first file ID in a file
+            file_id = FILE_ID_PATTERN.search(line) if not found_file_id else None
+            found_file_id = found_file_id or file_id is not None
+            if range_index < len(ranges) and ranges[range_index][0] <= line_number:
+                masked_file.write(line)
+            elif file_id is not None:
+                masked_file.write(file_id.group(0) + b"\n")
+            else:
+                masked_file.write(b"\n")
@@ -1,11 +1,19 @@
 """
 Module for generating reports based on terraform
 """
-import re
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
 
 from python_terraform import Terraform
 
+from .annotation import Annotation
+from .cache import hash_file, hash_key
 from .report import Report
+from .unified_diff import iter_hunks
+
+TERRAFORM_EXTENSIONS = (".tf", ".tfvars")
 
 
 class TerraformReport(Report):
@@ -25,13 +33,37 @@ class TerraformReport(Report):
         description,
         file_name=None,
         force_pass=False,
+        jobs=1,
+        changed_files=None,
+        cache=None,
+        **kwargs
     ):  # pylint: disable=too-many-locals
+        """
+        Runs `terraform fmt` and sets up the report from its output, see `Report` for the common arguments.
+        Args:
+            jobs: (optional) number of `terraform fmt` processes to run at once, each on a separate directory or file
+            changed_files: (optional) list of changed files, only the terraform files among them are checked
+            cache: (optional) ResultCache to reuse the results for unchanged files from, when checking changed files
+        """
         annotations_string = ""
-        if file_name is None:
+        files_scanned = None
+        tool_duration = None
+        start = time.perf_counter()
+        if file_name is None and changed_files is not None:
+            file_names = [
+                name for name in changed_files if name.endswith(TERRAFORM_EXTENSIONS) and os.path.isfile(name)
+            ]
+            files_scanned = len(file_names)
+            return_code, annotations_string = _fmt_files(file_names, jobs, cache)
+        elif file_name is None and jobs > 1:
+            return_code, annotations_string = _fmt_paths(_find_terraform_directories("."), jobs)
+        elif file_name is None:
             terraform = Terraform()
             return_code, annotations_string, error = terraform.fmt(  # pylint: disable=unused-variable
                 capture_output=True, check=True, diff=True, recursive=True
             )
+        if file_name is None:
+            tool_duration = time.perf_counter() - start
 
         if return_code == 0:
             result = "PASS"
@@ -51,30 +83,118 @@ class TerraformReport(Report):
             annotations_string=annotations_string,
             return_code=return_code,
             force_pass=force_pass,
+            files_scanned=files_scanned,
+            tool_duration=tool_duration,
+            **kwargs
         )
 
-    @staticmethod
-    def _process_annotations(annotations_string):
+    def _process_annotations(self, annotations_string):
         """
-        Converts the output of `terraform fmt --diff -check` to an annotations dictionary.
+        Converts the output of `terraform fmt --diff -check` to annotations.
         Args:
             annotations_string: terraform output to parse
         Returns:
-            Dictionary with the annotations.
+            List of Annotations.
+        """
+        return self._process_annotations_file(StringIO(annotations_string))
+
+    def _process_annotations_file(self, report_file):
         """
-        annotations = []
+        Converts the output of `terraform fmt --diff -check` to annotations, reading it one line at a time.
+        Args:
+            report_file: open file (or any iterable of lines) containing the terraform output
+        Returns:
+            List of Annotations.
+        """
+        error = "Error found in this block. Run `terraform fmt --diff -check` to see the issue (or run without `-check` to fix automatically)"
+
+        return [Annotation(hunk.path, hunk.start, error, "HIGH") for hunk in iter_hunks(report_file)]
+
+
+def _find_terraform_directories(root):
+    """
+    Finds the directories containing terraform files, skipping hidden directories such as `.terraform`.
+    Args:
+        root: directory to search from
+    Returns:
+        Sorted list of directories
+    """
+    directories = []
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names[:] = [dir_name for dir_name in dir_names if not dir_name.startswith(".")]
+        if any(file_name.endswith(TERRAFORM_EXTENSIONS) for file_name in file_names):
+            directories.append(os.path.normpath(dir_path))
+    return sorted(directories)
+
+
+def _fmt_path(path):
+    """
+    Checks the formatting of a single terraform file, or of the terraform files in a single directory.
+    Args:
+        path: file or directory to check, not including the subdirectories of a directory
+    Returns:
+        Tuple of the return code and the diff output of `terraform fmt`
+    """
+    return_code, output, _ = Terraform().fmt(path, capture_output=True, check=True, diff=True)
+    return return_code, output
 
-        if annotations_string:
-            # Split on the diff output pattern
-            split_output = re.compile(r"(.*\n-{3}.*\n\+{3}.*)").split(annotations_string)
-            for file_errors_counter in range(1, len(split_output), 2):
-                path = split_output[file_errors_counter].split("\n")[0]
 
-                entries = re.compile(r"(@{2}[\+\-\,\d\ ]*@{2})").split(split_output[file_errors_counter + 1])
+def _fmt_paths(paths, jobs):
+    """
+    Checks the formatting of several files or directories in parallel, rather than one recursive `terraform fmt` run.
+    Args:
+        paths: list of files or directories to check
+        jobs: number of `terraform fmt` processes to run at once
+    Returns:
+        Tuple of the highest return code and the diff output of all paths, in the order they were given
+    """
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = list(executor.map(_fmt_path, paths))
+    return _combine_results(results)
+
+
+def _fmt_files(file_names, jobs, cache=None):
+    """
+    Checks the formatting of terraform files, reusing cached results for files whose contents were checked before.
+    Args:
+        file_names: list of files to check
+        jobs: number of `terraform fmt` processes to run at once
+        cache: (optional) ResultCache holding the results of previous runs
+    Returns:
+        Tuple of the highest return code and the diff output of all files, in the order they were given
+    """
+    if cache is None:
+        return _fmt_paths(file_names, jobs)
 
-                for error_counter in range(1, len(entries), 2):
-                    line_number = entries[error_counter].split(" ")[1][1:].split(",")[0]
-                    error = "Error found in this block. Run `terraform fmt --diff -check` to see the issue (or run without `-check` to fix automatically)"
+    # The path is part of the key as it appears in the diff output
+    version = _terraform_version()
+    keys = {name: hash_key("terraform fmt", version, name, hash_file(name)) for name in file_names}
+    results = {name: cache.get(keys[name]) for name in file_names}
+    unchecked = [name for name in file_names if results[name] is None]
 
-                    annotations.append({"path": path, "line": line_number, "message": error, "severity": "HIGH"})
-        return {"annotations": annotations}
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for name, result in zip(unchecked, executor.map(_fmt_path, unchecked)):
+            results[name] = list(result)
+            cache.put(keys[name], results[name])
+    cache.prune()
+    return _combine_results([results[name] for name in file_names])
+
+
+def _combine_results(results):
+    """
+    Combines the results of several `terraform fmt` runs.
+    Args:
+        results: list of tuples of the return code and diff output of each run
+    Returns:
+        Tuple of the highest return code and the concatenated diff output
+    """
+    return_code = max((result[0] for result in results), default=0)
+    return return_code, "".join(result[1] for result in results)
+
+
+def _terraform_version():
+    """
+    Returns the version line of the terraform binary, as formatting rules can change between versions.
+    """
+    _, output, _ = Terraform().version(capture_output=True)
+    return output.split("\n", 1)[0]
@@ -0,0 +1,207 @@
+"""
+Module which tokenizes unified diff output (from `git diff`, `terraform fmt -diff`, etc.) in a single pass
+"""
+import re
+import subprocess
+from bisect import bisect_right
+from collections import namedtuple
+
+# Location of a hunk in the original version of a file
+Hunk = namedtuple("Hunk", ["path", "start", "length"])
+
+# Matches `@@ -12,7 +12,8 @@`, the lengths are left out by diff when they are 1
+HUNK_HEADER = re.compile(r"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+NULL_PATH = "/dev/null"
+
+# How many of the hunk's old and new lines each kind of content line uses up, context lines count for both sides
+CONTENT_LINE_STEPS = {" ": 2, "-": 1, "+": 1, "\\": 0}
+
+
+def iter_hunks(diff_lines):
+    """
+    Yields the location of every hunk in the diff, reading the diff one line at a time.
+    Lines inside a hunk are counted against the lengths in its header, so content lines which happen to start with
+    `---`, `+++` or `@@` aren't mistaken for headers. A line which can't be hunk content ends the hunk early.
+    Args:
+        diff_lines: iterable of unified diff lines, e.g. an open file
+    Yields:
+        Hunk for each hunk, with the path stripped of its `a/`, `old/`, etc. prefix
+    """
+    old_path = None
+    path = None
+    # Lines left in the current hunk, counting the old and new side separately
+    remaining = 0
+
+    for line in diff_lines:
+        if remaining:
+            step = CONTENT_LINE_STEPS.get(line[:1])
+            if step is not None:
+                remaining -= step
+                continue
+            # Anything else means the hunk was cut short, so treat the line as a header
+            remaining = 0
+
+        if line.startswith("--- "):
+            old_path = _strip_path(line)
+            path = None
+        elif line.startswith("+++ "):
+            path = _strip_path(line)
+            if path is None:
+                path = old_path
+        elif path is not None and line.startswith("@@"):
+            match = HUNK_HEADER.match(line)
+            if match:
+                length = _hunk_length(match.group(2))
+                remaining = length + _hunk_length(match.group(4))
+                yield Hunk(path, int(match.group(1)), length)
+
+
+def changed_line_ranges(diff_lines):
+    """
+    Builds an index of the lines added or changed by a diff, in the new version of each file.
+    Args:
+        diff_lines: iterable of unified diff lines, e.g. an open file
+    Returns:
+        Dictionary mapping each path to a sorted list of inclusive (first, last) line ranges
+    """
+    ranges = {}
+    path = None
+    old_remaining = 0
+    new_remaining = 0
+    line_number = 0
+
+    for line in diff_lines:
+        if old_remaining > 0 or new_remaining > 0:
+            marker = line[:1]
+            if marker == "+":
+                file_ranges = ranges.setdefault(path, [])
+                if file_ranges and file_ranges[-1][1] == line_number - 1:
+                    file_ranges[-1] = (file_ranges[-1][0], line_number)
+                else:
+                    file_ranges.append((line_number, line_number))
+                line_number += 1
+                new_remaining -= 1
+                continue
+            if marker == "-":
+                old_remaining -= 1
+                continue
+            if marker == " ":
+                line_number += 1
+                old_remaining -= 1
+                new_remaining -= 1
+                continue
+            if marker == "\\":
+                continue
+            old_remaining = new_remaining = 0
+
+        if line.startswith("--- "):
+            path = None
+        elif line.startswith("+++ "):
+            # Deleted files have no new version, so their path is None and their hunks are skipped
+            path = _strip_path(line)
+        elif path is not None and line.startswith("@@"):
+            match = HUNK_HEADER.match(line)
+            if match:
+                old_remaining = _hunk_length(match.group(2))
+                new_remaining = _hunk_length(match.group(4))
+                line_number = int(match.group(3))
+
+    return ranges
+
+
+def in_ranges(ranges, line):
+    """
+    Checks whether a line falls in any of a list of ranges.
+    Args:
+        ranges: sorted list of inclusive (first, last) line ranges, as built by `changed_line_ranges`
+        line: line number
+    Returns:
+        True if the line is in one of the ranges
+    """
+    index = bisect_right(ranges, (line, float("inf")))
+    return index > 0 and ranges[index - 1][1] >= line
+
+
+def git_changed_line_ranges(base_ref):
+    """
+    Builds the index of changed lines under the current directory between a base commit and HEAD, as shown in a
+    pull request.
+    Args:
+        base_ref: commit, branch or tag the changes are compared against
+    Returns:
+        Dictionary mapping each path, relative to the current directory, to a sorted list of inclusive (first, last)
+        line ranges
+    Raises:
+        ValueError: if git fails
+    """
+    # The prefixes are pinned as `_strip_path` removes them, whatever diff.noprefix or diff.mnemonicPrefix are set to
+    process = subprocess.Popen(
+        [
+            "git",
+            "diff",
+            "--no-color",
+            "--no-ext-diff",
+            "--relative",
+            "--src-prefix=a/",
+            "--dst-prefix=b/",
+            "-U0",
+            base_ref + "...HEAD",
+        ],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    with process.stdout:
+        ranges = changed_line_ranges(process.stdout)
+    if process.wait() != 0:
+        raise ValueError("Unable to diff against {base_ref}.".format(base_ref=base_ref))
+    return ranges
+
+
+def git_changed_files(base_ref):
+    """
+    Lists the files under the current directory added or modified between a base commit and HEAD.
+    Args:
+        base_ref: commit, branch or tag the changes are compared against
+    Returns:
+        List of paths relative to the current directory
+    Raises:
+        ValueError: if git fails
+    """
+    process = subprocess.Popen(
+        ["git", "diff", "--no-color", "--name-only", "--relative", "--diff-filter=d", base_ref + "...HEAD"],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    with process.stdout:
+        file_names = [line.rstrip("\n") for line in process.stdout if line.strip()]
+    if process.wait() != 0:
+        raise ValueError("Unable to diff against {base_ref}.".format(base_ref=base_ref))
+    return file_names
+
+
+def _strip_path(header_line):
+    """
+    Extracts the path from a `---`/`+++` header line.
+    Args:
+        header_line: line such as `+++ b/path/to/file`
+    Returns:
+        Path without its leading prefix directory, or None for `/dev/null`
+    """
+    path = header_line[4:].rstrip("\r\n").split("\t")[0]
+    if path == NULL_PATH:
+        return None
+    return path.split("/", 1)[-1]
+
+
+def _hunk_length(length):
+    """
+    Converts an optional hunk length from the header to an int.
+    Args:
+        length: length string from the header, or None if it was left out
+    Returns:
+        Number of lines in the hunk
+    """
+    if length is None:
+        return 1
+    return int(length)
@@ -21,6 +21,8 @@ with open("CHANGELOG.md") as changelog_file:
 
 requirements = ["python-terraform==0.10.0", "requests==2.22.0", "scspell3k==2.2"]
 
+extras_requirements = {"async": ["aiohttp"], "yaml": ["PyYAML"]}
+
 setup_requirements = ["pytest-runner"]
 
 test_requirements = ["pytest", "pytest-cov", "coverage", "hypothesis"]
@@ -41,6 +43,7 @@ setup(
     description="Upload reports to BitBucket server for use with the Code Insights feature",
     entry_points={"console_scripts": ["bitbucket-code-insight-reports=bitbucket_code_insight_reports.cli:main"]},
     install_requires=requirements,
+    extras_require=extras_requirements,
     license="Apache Software License 2.0",
     long_description=readme + "\n\n" + changelog,
     long_description_content_type="text/markdown",
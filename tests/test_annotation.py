@@ -0,0 +1,86 @@
+import json
+
+from bitbucket_code_insight_reports.annotation import Annotation, cap_annotations, serialize_batch
+
+
+def test_round_trip():
+    """
+    Tests annotations convert to and from the BitBucket API format, keeping extra fields and converting lines to ints
+    """
+    annotation = Annotation.from_dict(
+        {"path": "a.py", "line": "12", "message": "m", "severity": "LOW", "link": "https://example.com"}
+    )
+
+    assert annotation.line == 12
+    assert annotation.to_dict() == {
+        "path": "a.py",
+        "line": 12,
+        "message": "m",
+        "severity": "LOW",
+        "link": "https://example.com",
+    }
+    assert Annotation.from_dict({"message": "whole file"}).to_dict() == {"message": "whole file"}
+
+
+def test_compact():
+    """
+    Tests annotations don't carry a dictionary each and share the strings read from JSON
+    """
+    first = Annotation.from_dict({"path": "".join(["src/", "a.py"]), "line": 1, "message": "m", "severity": "LOW"})
+    second = Annotation.from_dict({"path": "".join(["src/", "a.py"]), "line": 2, "message": "m", "severity": "LOW"})
+
+    assert not hasattr(first, "__dict__")
+    assert first.path is second.path
+
+
+def test_external_id():
+    """
+    Tests the external ID is stable across string and int lines, and that an ID from the input takes precedence
+    """
+    annotation = Annotation("a.py", 3, "m", "LOW")
+
+    assert annotation.external_id == Annotation("a.py", "3", "m", "LOW").external_id
+    assert annotation.external_id != Annotation("a.py", 4, "m", "LOW").external_id
+    assert Annotation.from_dict(json.loads('{"line": 1, "externalId": "mine"}')).external_id == "mine"
+
+
+def test_serialize_batch():
+    """
+    Tests the request body is valid JSON holding each annotation with its external ID
+    """
+    annotations = [(str(line), Annotation("a.py", line, "m" * 50, "LOW")) for line in range(100)]
+
+    decoded = json.loads(serialize_batch(annotations).decode("utf-8"))
+
+    assert len(decoded["annotations"]) == 100
+    assert decoded["annotations"][5] == {
+        "path": "a.py",
+        "line": 5,
+        "message": "m" * 50,
+        "severity": "LOW",
+        "externalId": "5",
+    }
+    assert serialize_batch([]) == b'{"annotations": []}'
+
+
+def test_cap_annotations():
+    """
+    Tests capping keeps higher severities first, then annotations on changed lines, in their original order
+    """
+    annotations = [
+        Annotation("a.py", 1, "low", "LOW"),
+        Annotation("a.py", 2, "medium", "MEDIUM"),
+        Annotation("a.py", 3, "low changed", "LOW"),
+        Annotation("a.py", 4, "high", "HIGH"),
+        Annotation("a.py", 5, "medium", "MEDIUM"),
+    ]
+
+    kept, dropped = cap_annotations(annotations, 3, is_changed=lambda annotation: annotation.line == 3)
+    assert [annotation.line for annotation in kept] == [2, 4, 5]
+    assert dropped == {"LOW": 2}
+
+    kept, dropped = cap_annotations(annotations, 4, is_changed=lambda annotation: annotation.line == 3)
+    assert [annotation.line for annotation in kept] == [2, 3, 4, 5]
+    assert dropped == {"LOW": 1}
+
+    assert cap_annotations(annotations, 5) == (annotations, {})
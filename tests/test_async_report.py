@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+import pytest
+
+from bitbucket_code_insight_reports.async_report import publish_reports
+from bitbucket_code_insight_reports.fake_server import FakeCodeInsightsServer
+from bitbucket_code_insight_reports.report import Report
+
+pytest.importorskip("aiohttp")
+
+
+def _run(coroutine):
+    """
+    Runs a coroutine on a new event loop
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def _gen_reports(server, count, annotations):
+    """
+    Generates reports for several commits with the given number of annotations each
+    """
+    annotations_string = json.dumps(
+        {
+            "annotations": [
+                {"path": "file.c", "line": line, "message": "test", "severity": "LOW"} for line in range(annotations)
+            ]
+        }
+    )
+    return [
+        Report(
+            ("user", "password"),
+            server.url,
+            "PROJ",
+            "repo",
+            "commit{index}".format(index=index),
+            "key",
+            "title",
+            "desc",
+            "FAIL",
+            annotations_string,
+            session=object(),
+        )
+        for index in range(count)
+    ]
+
+
+def test_publish_reports():
+    """
+    Tests many reports are published concurrently, retrying throttled requests
+    """
+    server = FakeCodeInsightsServer(max_annotations_per_request=10, throttle_rate=0.2, seed=1).start()
+    try:
+        reports = _gen_reports(server, 50, 25)
+        results = _run(publish_reports(reports, concurrency=8, batch_size=10, retries=10, backoff_factor=0))
+    finally:
+        server.stop()
+
+    assert results == [[]] * 50
+    assert len(server.reports) == 50
+    assert all(len(annotations) == 25 for annotations in server.annotations.values())
+
+
+def test_publish_errors():
+    """
+    Tests failed batches are reported like blocking uploads, and stored on the report
+    """
+    server = FakeCodeInsightsServer(max_annotations_per_request=10, max_annotations_per_report=15).start()
+    try:
+        reports = _gen_reports(server, 1, 25)
+        results = _run(publish_reports(reports, batch_size=10, workers=1))
+    finally:
+        server.stop()
+
+    assert results == [["Batch 1 (annotations 10-19): 400 Bad Request"]]
+    assert reports[0].upload_errors == results[0]
@@ -0,0 +1,46 @@
+import os
+
+from bitbucket_code_insight_reports.cache import ResultCache, hash_file, hash_key
+
+
+def test_get_put(tmp_path):
+    """
+    Tests results are stored and read back, and missing keys return None
+    """
+    cache = ResultCache(str(tmp_path / "cache"))
+    key = hash_key("one", "two")
+
+    assert cache.get(key) is None
+    cache.put(key, ["5: 'wrold' not found in dictionary"])
+    assert cache.get(key) == ["5: 'wrold' not found in dictionary"]
+    assert hash_key("one", "two") != hash_key("onetwo")
+
+
+def test_prune_least_recently_used(tmp_path):
+    """
+    Tests pruning removes the least recently used entries first
+    """
+    cache = ResultCache(str(tmp_path), max_size=1)
+    for index, key in enumerate(["old", "used", "new"]):
+        cache.put(key, "x" * 100)
+        os.utime(str(tmp_path / (key + ".json")), (index, index))
+    cache.max_size = 250
+
+    cache.get("old")
+    cache.prune()
+
+    assert cache.get("used") is None
+    assert cache.get("old") is not None
+    assert cache.get("new") is not None
+
+
+def test_hash_file(tmp_path):
+    """
+    Tests files with the same contents have the same hash
+    """
+    (tmp_path / "a").write_text("content")
+    (tmp_path / "b").write_text("content")
+    (tmp_path / "c").write_text("other")
+
+    assert hash_file(str(tmp_path / "a")) == hash_file(str(tmp_path / "b"))
+    assert hash_file(str(tmp_path / "a")) != hash_file(str(tmp_path / "c"))
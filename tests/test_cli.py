@@ -2,11 +2,13 @@
 # -*- coding: utf-8 -*-
 
 """Tests for `bitbucket_code_insight_reports` package."""
+import subprocess
+import sys
 from argparse import ArgumentError
 
 import pytest
 
-from bitbucket_code_insight_reports import cli
+from bitbucket_code_insight_reports import cli, factory
 
 
 def test_arg_parse():
@@ -65,3 +67,51 @@ def test_arg_parse():
     assert parser.file_list == ["test_file_1", "test_file_2"]
     assert parser.dict == ["/some/path/to/dictionary"]
     assert parser.silent == True
+
+
+def test_report_backends_imported_lazily():
+    """
+    Ensure parsing arguments doesn't import the tools behind the report types, nor requests.
+    Runs in a fresh interpreter since other tests will already have imported them.
+    """
+    code = "\n".join(
+        [
+            "import sys",
+            "from bitbucket_code_insight_reports import cli",
+            "try:",
+            "    cli.parse_args(['--help'])",
+            "except SystemExit:",
+            "    pass",
+            "print('loaded:' + ','.join(sorted(m for m in ('requests', 'scspell', 'python_terraform') if m in sys.modules)))",
+        ]
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], universal_newlines=True)
+
+    assert output.strip().split("\n")[-1] == "loaded:"
+
+
+def test_get_report_class():
+    """
+    Ensure report classes are resolved by report type
+    """
+    from bitbucket_code_insight_reports.git_diff_report import GitDiffReport
+
+    assert factory.get_report_class("git-diff") is GitDiffReport
+    with pytest.raises(ValueError):
+        factory.get_report_class("unknown")
+
+
+def test_targets():
+    """
+    Ensure further commits to upload to are parsed, and can't be combined with --sync
+    """
+    args = ["--user", "u", "--base_url", "url", "--project_key", "PROJ", "--repo_slug", "repo", "--commit", "head"]
+    args += ["--report_key", "k", "--report_title", "t", "--report_desc", "d", "--report_type", "custom"]
+
+    parsed = cli.parse_args(args + ["--targets", "PROJ/repo/merge", "MIRROR/repo/head"])
+
+    assert parsed.targets == [("PROJ", "repo", "merge"), ("MIRROR", "repo", "head")]
+    with pytest.raises(SystemExit):
+        cli.parse_args(args + ["--targets", "PROJ/repo"])
+    with pytest.raises(SystemExit):
+        cli.parse_args(args + ["--targets", "PROJ/repo/merge", "--sync"])
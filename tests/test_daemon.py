@@ -0,0 +1,103 @@
+import json
+import tempfile
+import threading
+from io import StringIO
+
+from bitbucket_code_insight_reports.daemon import ReportDaemon, submit
+from bitbucket_code_insight_reports.fake_server import FakeCodeInsightsServer
+
+
+def test_submit(tmp_path, capsys):
+    """
+    Tests reports submitted to the daemon run in the client's directory and reuse the daemon's session
+    """
+    server = FakeCodeInsightsServer().start()
+    daemon = ReportDaemon(str(tmp_path / "daemon.sock"))
+    threading.Thread(target=daemon.serve_forever, daemon=True).start()
+    annotations = {"annotations": [{"path": "a.c", "line": 1, "message": "m", "severity": "LOW"}]}
+    (tmp_path / "annotations.json").write_text(json.dumps(annotations))
+
+    def _submit(*options):
+        argv = ["--user", "user", "--password", "password", "--base_url", server.url, "--project_key", "PROJ"]
+        argv += ["--repo_slug", "repo", "--commit", "commit", "--report_title", "title", "--report_desc", "desc"]
+        return submit(daemon.server_address, argv + list(options), cwd=str(tmp_path))
+
+    try:
+        first = _submit(
+            "--report_key", "first", "--report_type", "custom", "--status", "FAIL", "--file", "annotations.json"
+        )
+        second = _submit("--report_key", "second", "--report_type", "custom", "--status", "PASS", "--annotations", "[]")
+        invalid = _submit("--report_key", "third", "--report_type", "unknown")
+    finally:
+        daemon.shutdown()
+        daemon.server_close()
+        server.stop()
+
+    output = capsys.readouterr()
+    assert (first, second, invalid) == (1, 0, 2)
+    assert server.annotations[("PROJ", "repo", "commit", "first")][0]["path"] == "a.c"
+    assert ("PROJ", "repo", "commit", "second") in server.reports
+    assert len(daemon.sessions) == 1
+    assert '"path": "a.c"' in output.out
+    assert "invalid choice: 'unknown'" in output.err
+    assert not (tmp_path / "daemon.sock").exists()
+
+
+def test_submit_stdin(tmp_path, monkeypatch):
+    """
+    Tests the client's stdin is forwarded to reports reading stdin, which would otherwise read the daemon's
+    """
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    server = FakeCodeInsightsServer().start()
+    daemon = ReportDaemon(str(tmp_path / "daemon.sock"))
+    threading.Thread(target=daemon.serve_forever, daemon=True).start()
+
+    def _submit(stdin, *options):
+        argv = ["--user", "user", "--password", "password", "--base_url", server.url, "--project_key", "PROJ"]
+        argv += ["--repo_slug", "repo", "--commit", "commit", "--report_title", "title", "--report_desc", "desc"]
+        return submit(daemon.server_address, argv + list(options), cwd=str(tmp_path), stdin=StringIO(stdin))
+
+    try:
+        lint = _submit(
+            "a.py:3:1: F401 'os' imported but unused\n",
+            "--report_key",
+            "lint",
+            "--report_type",
+            "lint",
+            "--linter",
+            "flake8",
+        )
+        custom = _submit(
+            '{"annotations": [{"path": "b.c", "line": 2, "message": "m", "severity": "LOW"}]}',
+            "--report_key",
+            "custom",
+            "--report_type",
+            "custom",
+            "--status",
+            "PASS",
+            "--file",
+            "-",
+        )
+    finally:
+        daemon.shutdown()
+        daemon.server_close()
+        server.stop()
+
+    assert (lint, custom) == (1, 0)
+    assert server.annotations[("PROJ", "repo", "commit", "lint")][0]["path"] == "a.py"
+    assert server.annotations[("PROJ", "repo", "commit", "custom")][0]["path"] == "b.c"
+    # The spooled input is removed once the report has run
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_submit_without_daemon(tmp_path, capsys):
+    """
+    Tests a clear error is reported when no daemon is listening on the socket
+    """
+    missing = submit(str(tmp_path / "missing.sock"), ["--report_key", "key"])
+    # A socket file left behind by a daemon which is no longer running refuses connections
+    (tmp_path / "stopped.sock").touch()
+    stopped = submit(str(tmp_path / "stopped.sock"), ["--report_key", "key"])
+
+    assert (missing, stopped) == (1, 1)
+    assert capsys.readouterr().err.count("Unable to reach the report daemon on ") == 2
@@ -0,0 +1,54 @@
+import pytest
+
+from bitbucket_code_insight_reports.dict_index import DictionaryIndex, compile_index, main
+
+
+def test_compile_and_match(tmp_path):
+    """
+    Tests dictionaries are merged into an index matching words and their prefixes, as scspell's natural dictionary
+    """
+    first = tmp_path / "first.txt"
+    first.write_text("NATURAL:\nkubernetes\nterraform\n\n", encoding="utf-8")
+    second = tmp_path / "second.txt"
+    second.write_text("NATURAL:\nterraform\ngrüße\nansible\n", encoding="utf-8")
+    index_file = str(tmp_path / "words.idx")
+
+    assert compile_index([str(first), str(second)], index_file) == 4
+
+    with DictionaryIndex(index_file) as index:
+        assert len(index) == 4
+        assert [word for word in ["ansible", "grüße", "kubernetes", "terraform"] if index.match(word)] == [
+            "ansible",
+            "grüße",
+            "kubernetes",
+            "terraform",
+        ]
+        assert index.match("terra")
+        assert not index.match("terraforms")
+        assert not index.match("aaa")
+        assert not index.match("zzz")
+
+
+def test_empty_index(tmp_path):
+    """
+    Tests an index without words matches nothing
+    """
+    index_file = str(tmp_path / "empty.idx")
+    compile_index([], index_file)
+
+    with DictionaryIndex(index_file) as index:
+        assert len(index) == 0
+        assert not index.match("word")
+
+
+def test_invalid_input(tmp_path, capsys):
+    """
+    Tests file type dictionaries are rejected, as are files which aren't indexes
+    """
+    dictionary = tmp_path / "dictionary.txt"
+    dictionary.write_text("FILETYPE: Python; .py\ndef\n")
+
+    assert main([str(dictionary), "--output", str(tmp_path / "words.idx")]) == 1
+    assert "only natural dictionaries can be compiled" in capsys.readouterr().out
+    with pytest.raises(ValueError, match="not a dictionary index"):
+        DictionaryIndex(str(dictionary))
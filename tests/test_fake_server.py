@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from bitbucket_code_insight_reports.fake_server import FakeCodeInsightsServer
+from bitbucket_code_insight_reports.report import Report
+from bitbucket_code_insight_reports.session import create_session
+
+
+@pytest.fixture
+def gen_report():
+    """
+    Generates a report with the given number of annotations for a server
+    """
+
+    def _gen_report(server, count, retries=0):
+        annotations = {
+            "annotations": [
+                {"path": "file.c", "line": index + 1, "message": "test", "severity": "LOW"} for index in range(count)
+            ]
+        }
+        return Report(
+            ("user", "password"),
+            server.url,
+            "PROJ",
+            "repo",
+            "commit",
+            "key",
+            "title",
+            "desc",
+            "FAIL",
+            json.dumps(annotations),
+            session=create_session(retries=retries, backoff_factor=0),
+        )
+
+    return _gen_report
+
+
+def test_upload(gen_report):
+    """
+    Tests reports and annotations uploaded to the fake server are stored
+    """
+    server = FakeCodeInsightsServer(max_annotations_per_request=10).start()
+    try:
+        report = gen_report(server, 25)
+        report.post_base_report()
+        errors = report.post_annotations(batch_size=10)
+    finally:
+        server.stop()
+
+    assert errors == []
+    assert server.reports[("PROJ", "repo", "commit", "key")]["result"] == "FAIL"
+    assert len(server.annotations[("PROJ", "repo", "commit", "key")]) == 25
+
+
+def test_limits_and_failures(gen_report):
+    """
+    Tests the annotation limits and injected failures are reported as failed batches
+    """
+    server = FakeCodeInsightsServer(max_annotations_per_request=10, max_annotations_per_report=15).start()
+    try:
+        report = gen_report(server, 25)
+        report.post_base_report()
+        limit_errors = report.post_annotations(batch_size=10, workers=1)
+
+        server.throttle_rate = 1.0
+        throttle_errors = report.post_annotations(batch_size=10, workers=1)
+    finally:
+        server.stop()
+
+    assert limit_errors == ["Batch 1 (annotations 10-19): 400 Bad Request"]
+    assert len(throttle_errors) == 3
+    assert all("429" in error for error in throttle_errors)
+
+
+def test_retried_upload(gen_report):
+    """
+    Tests throttled uploads are retried, resending the streamed request bodies in full
+    """
+    server = FakeCodeInsightsServer(max_annotations_per_request=10, throttle_rate=0.5, seed=1).start()
+    try:
+        report = gen_report(server, 25, retries=20)
+        report.post_base_report()
+        errors = report.post_annotations(batch_size=10, workers=1)
+    finally:
+        server.stop()
+
+    assert errors == []
+    assert server.requests_received > 4
+    assert sorted(annotation["line"] for annotation in server.annotations[("PROJ", "repo", "commit", "key")]) == list(
+        range(1, 26)
+    )
@@ -23,7 +23,7 @@ def gen_get_diff_annotation():
             dicts["annotations"].append(
                 {
                     "path": loc[0],
-                    "line": str(loc[1]),
+                    "line": loc[1],
                     "message": "{title}: Error found starting here.".format(title=title),
                     "severity": "HIGH",
                 }
@@ -61,4 +61,4 @@ def test_init(gen_get_diff_annotation):
             )
 
     assert test_report.result == "FAIL"
-    assert test_report.annotations == test_annotations
+    assert [annotation.to_dict() for annotation in test_report.annotations] == test_annotations["annotations"]
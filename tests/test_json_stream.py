@@ -0,0 +1,63 @@
+import json
+
+import pytest
+from hypothesis import strategies as strat, given
+
+from bitbucket_code_insight_reports.json_stream import ITEM, iter_values
+
+JSON_VALUES = strat.recursive(
+    strat.none() | strat.booleans() | strat.integers() | strat.floats(allow_nan=False) | strat.text(),
+    lambda children: strat.lists(children) | strat.dictionaries(strat.text(), children),
+    max_leaves=10,
+)
+
+
+def _chunked(text, size):
+    """
+    Splits text into chunks of the given size
+    """
+    return [text[start : start + size] for start in range(0, len(text), size)]
+
+
+@given(items=strat.lists(JSON_VALUES), other=JSON_VALUES, chunk_size=strat.integers(min_value=1, max_value=20))
+def test_items_across_chunks(items, other, chunk_size):
+    """
+    Tests the values at a path are decoded whole however the document is split into chunks, skipping other values
+    """
+    document = json.dumps({"before": other, "annotations": items, "after": other}, indent=1)
+
+    values = [value for _, value in iter_values(_chunked(document, chunk_size), [("annotations", ITEM)])]
+
+    assert values == items
+
+
+def test_nested_paths():
+    """
+    Tests values are yielded in document order with their path, when several nested paths are requested
+    """
+    document = json.dumps(
+        {
+            "runs": [
+                {"tool": {"name": "one"}, "results": [1, 2], "extra": [3]},
+                {"results": [], "tool": {"name": "two"}},
+            ]
+        }
+    )
+
+    values = list(iter_values(_chunked(document, 7), [("runs", ITEM, "tool"), ("runs", ITEM, "results", ITEM)]))
+
+    assert values == [
+        (("runs", ITEM, "tool"), {"name": "one"}),
+        (("runs", ITEM, "results", ITEM), 1),
+        (("runs", ITEM, "results", ITEM), 2),
+        (("runs", ITEM, "tool"), {"name": "two"}),
+    ]
+
+
+@pytest.mark.parametrize("document", ['{"annotations": [1, 2', '{"annotations": [1 2]}', '{"annotations": []} []', ""])
+def test_invalid(document):
+    """
+    Tests invalid and truncated documents raise errors
+    """
+    with pytest.raises(ValueError):
+        list(iter_values(_chunked(document, 3), [("annotations", ITEM)]))
@@ -0,0 +1,94 @@
+import io
+from unittest.mock import Mock, patch
+
+import pytest
+
+from bitbucket_code_insight_reports.lint_report import LINT_PARSERS, LineParser, LintReport, get_lint_parser
+
+LINT_OUTPUTS = {
+    "flake8": (
+        "./src/app.py:12:80: E501 line too long (88 > 79 characters)\n"
+        "./src/app.py:3:1: F401 'os' imported but unused\n",
+        [
+            ("src/app.py", 12, "E501 line too long (88 > 79 characters)", "MEDIUM"),
+            ("src/app.py", 3, "F401 'os' imported but unused", "HIGH"),
+        ],
+    ),
+    "pylint": (
+        "************* Module app\n"
+        "src/app.py:1:0: C0114: Missing module docstring (missing-module-docstring)\n"
+        "src/app.py:7:4: W0612: Unused variable 'x' (unused-variable)\n"
+        "\n"
+        "Your code has been rated at 8.00/10\n",
+        [
+            ("src/app.py", 1, "C0114: Missing module docstring (missing-module-docstring)", "LOW"),
+            ("src/app.py", 7, "W0612: Unused variable 'x' (unused-variable)", "MEDIUM"),
+        ],
+    ),
+    "eslint": (
+        "/repo/web/index.js:4:7: 'unused' is assigned a value but never used. [Error/no-unused-vars]\n"
+        "/repo/web/index.js:9:1: Unexpected console statement. [Warning/no-console]\n"
+        "\n"
+        "2 problems\n",
+        [
+            ("/repo/web/index.js", 4, "'unused' is assigned a value but never used. [Error/no-unused-vars]", "HIGH"),
+            ("/repo/web/index.js", 9, "Unexpected console statement. [Warning/no-console]", "MEDIUM"),
+        ],
+    ),
+    "shellcheck": (
+        "deploy.sh:5:6: warning: Quote this to prevent word splitting. [SC2046]\n"
+        "deploy.sh:8:1: note: Double quote to prevent globbing and word splitting. [SC2086]\n",
+        [
+            ("deploy.sh", 5, "Quote this to prevent word splitting. [SC2046]", "MEDIUM"),
+            ("deploy.sh", 8, "Double quote to prevent globbing and word splitting. [SC2086]", "LOW"),
+        ],
+    ),
+}
+
+
+@pytest.mark.parametrize("linter", sorted(LINT_OUTPUTS))
+def test_parsers(linter):
+    """
+    Tests the output of each linter is converted to annotations, skipping lines which aren't findings
+    """
+    output, expected = LINT_OUTPUTS[linter]
+    parse = LINT_PARSERS[linter].parse
+
+    annotations = [parse(line) for line in io.StringIO(output)]
+    annotations = [annotation for annotation in annotations if annotation is not None]
+
+    assert [(a.path, a.line, a.message, a.severity) for a in annotations] == expected
+
+
+def test_stdin(monkeypatch):
+    """
+    Tests linter output is read from stdin, failing the report if there are findings
+    """
+    monkeypatch.setattr("sys.stdin", io.StringIO(LINT_OUTPUTS["flake8"][0]))
+    test_report = LintReport("test", "test", "test", "test", "test", "test", "test", "test", "flake8", session=Mock())
+
+    assert len(test_report.annotations) == 2
+    assert (test_report.result, test_report.return_code) == ("FAIL", 1)
+
+    monkeypatch.setattr("sys.stdin", io.StringIO(""))
+    test_report = LintReport("test", "test", "test", "test", "test", "test", "test", "test", "pylint", session=Mock())
+
+    assert (test_report.result, test_report.return_code) == ("PASS", 0)
+
+
+def test_entry_points():
+    """
+    Tests parsers of other packages are only looked up when the linter isn't built in
+    """
+    custom = LineParser(r"(?P<path>[^:]+):(?P<line>\d+): (?P<message>.*)")
+    entry_point = Mock()
+    entry_point.load.return_value = custom
+
+    with patch(
+        "bitbucket_code_insight_reports.lint_report._lint_parser_entry_points", return_value={"custom": entry_point}
+    ) as mock_entry_points:
+        assert get_lint_parser("flake8") is LINT_PARSERS["flake8"]
+        assert not mock_entry_points.called
+        assert get_lint_parser("custom") is custom
+        with pytest.raises(ValueError, match="custom, eslint, flake8, pylint, shellcheck"):
+            get_lint_parser("unknown")
@@ -0,0 +1,99 @@
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from bitbucket_code_insight_reports import cli
+from bitbucket_code_insight_reports.manifest import build_options, load_manifest, run_manifest
+
+BASE_ARGS = [
+    "--user",
+    "test_user",
+    "--password",
+    "test_password",
+    "--base_url",
+    "test_url",
+    "--project_key",
+    "test_project_key",
+    "--repo_slug",
+    "test_repo_slug",
+    "--commit",
+    "test_commit",
+    "--silent",
+]
+
+
+def gen_entry(key, status):
+    """
+    Generates a manifest entry for a custom report
+    """
+    return {
+        "report_type": "custom",
+        "report_key": key,
+        "report_title": key,
+        "report_desc": "test",
+        "status": status,
+        "annotations": json.dumps({"annotations": [{"path": "a", "line": 1, "message": "m", "severity": "LOW"}]}),
+    }
+
+
+def test_load_manifest(tmp_path):
+    """
+    Tests that JSON and YAML manifests are loaded and validated
+    """
+    json_manifest = tmp_path / "manifest.json"
+    json_manifest.write_text(json.dumps({"reports": [gen_entry("one", "PASS")]}))
+    assert load_manifest(str(json_manifest)) == [gen_entry("one", "PASS")]
+
+    yaml_manifest = tmp_path / "manifest.yaml"
+    yaml_manifest.write_text("- report_type: terraform\n  report_key: tf\n  report_title: TF\n  report_desc: desc\n")
+    assert load_manifest(str(yaml_manifest)) == [
+        {"report_type": "terraform", "report_key": "tf", "report_title": "TF", "report_desc": "desc"}
+    ]
+
+    bad_manifest = tmp_path / "bad.json"
+    bad_manifest.write_text(json.dumps([{"report_type": "custom", "colour": "red"}]))
+    with pytest.raises(ValueError):
+        load_manifest(str(bad_manifest))
+
+
+def test_build_options():
+    """
+    Tests entries share the dictionaries given on the command line unless they name their own
+    """
+    args = cli.parse_args(BASE_ARGS + ["--manifest", "manifest.json", "--dict", "shared.txt", "--jobs", "4"])
+
+    shared = build_options(args, {"report_type": "spell-check"})
+    own = build_options(args, {"report_type": "spell-check", "dict": "own.txt"})
+
+    assert (shared.dict, shared.jobs, shared.file_list) == (["shared.txt"], 1, None)
+    assert own.dict == ["own.txt"]
+
+
+def test_run_manifest(tmp_path):
+    """
+    Tests every report in the manifest is uploaded over the shared session with an aggregated return code
+    """
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps([gen_entry("one", "PASS"), gen_entry("two", "FAIL")]))
+    args = cli.parse_args(BASE_ARGS + ["--manifest", str(manifest)])
+    session = Mock()
+
+    return_code = run_manifest(("test_user", "test_password"), args, session)
+
+    assert return_code == 1
+    assert session.put.call_count == 2
+    assert session.post.call_count == 2
+    put_urls = sorted(call_args[0][0] for call_args in session.put.call_args_list)
+    assert put_urls == [
+        "test_url/rest/insights/1.0/projects/test_project_key/repos/test_repo_slug/commits/test_commit/reports/one",
+        "test_url/rest/insights/1.0/projects/test_project_key/repos/test_repo_slug/commits/test_commit/reports/two",
+    ]
+
+
+def test_report_options_required_without_manifest():
+    """
+    Tests the report options are still required when no manifest is given
+    """
+    with pytest.raises(SystemExit):
+        cli.parse_args(BASE_ARGS)
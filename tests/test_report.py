@@ -1,9 +1,13 @@
 import pytest
 import json
+from unittest.mock import Mock, patch
 
 from hypothesis import strategies as strat, given
 
+from bitbucket_code_insight_reports import report as report_module
 from bitbucket_code_insight_reports.report import Report
+from bitbucket_code_insight_reports.fake_server import FakeCodeInsightsServer
+from bitbucket_code_insight_reports.session import create_session
 
 
 @pytest.fixture
@@ -55,7 +59,7 @@ def test_init(
         auth, base_url, project_key, repo_slug, commit_id, key, title, description, result, test_annotation_string
     )
 
-    assert test_annotation == test_report.annotations
+    assert [annotation.to_dict() for annotation in test_report.annotations] == test_annotation["annotations"]
     assert auth == test_report.auth
     assert test_report_url == test_report.url
     assert title == test_report.title
@@ -90,3 +94,249 @@ def test_force_pass(gen_annotations):
     )
     assert test_report.result == "PASS"
     assert test_report.return_code == 0
+
+
+def test_post_annotations_batches(gen_annotations):
+    """
+    Ensure duplicate annotations are dropped, the rest split into batches and failing batches reported individually
+    """
+    annotations = {
+        "annotations": [gen_annotations("/test", line, "test")["annotations"][0] for line in range(5)]
+        + gen_annotations("/test", 0, "test")["annotations"]
+    }
+    session = Mock()
+    test_report = Report(
+        "test", "test", "test", "test", "test", "test", "test", "test", "FAIL", json.dumps(annotations), session=session
+    )
+    mock_post = session.post
+
+    failed_response = Mock(ok=False, status_code=500, reason="Server Error")
+
+    def _post(url, data, headers, auth):
+        # Sent with a Content-Length, as requests only retries bodies it doesn't have to stream in chunks
+        assert isinstance(data, bytes)
+        batch = json.loads(data.decode("utf-8"))["annotations"]
+        return failed_response if len(batch) == 1 else Mock(ok=True)
+
+    mock_post.side_effect = _post
+
+    errors = test_report.post_annotations(batch_size=2, workers=2)
+
+    assert mock_post.call_count == 3
+    for call_args in mock_post.call_args_list:
+        assert (
+            call_args[0][0] == "test/rest/insights/1.0/projects/test/repos/test/commits/test/reports/test/annotations"
+        )
+    assert errors == ["Batch 2 (annotations 4-4): 500 Server Error"]
+    assert test_report.upload_errors == errors
+
+
+def test_create_session():
+    """
+    Ensure the default session retries with backoff and keeps a sized connection pool
+    """
+    session = create_session(pool_size=7, retries=2, backoff_factor=0.1)
+
+    adapter = session.get_adapter("https://bitbucket.example.com")
+    assert adapter._pool_maxsize == 7
+    assert adapter.max_retries.total == 2
+    assert adapter.max_retries.backoff_factor == 0.1
+    assert 503 in adapter.max_retries.status_forcelist
+
+
+def test_sync_annotations():
+    """
+    Ensure a rerun only uploads new annotations and deletes the stale ones
+    """
+    server = FakeCodeInsightsServer().start()
+    report_id = ("PROJ", "repo", "commit", "key")
+
+    def _sync(lines):
+        annotations = [{"path": "file.c", "line": line, "message": "test", "severity": "LOW"} for line in lines]
+        test_report = Report(
+            ("user", "password"),
+            server.url,
+            *report_id,
+            "title",
+            "desc",
+            "FAIL",
+            json.dumps({"annotations": annotations}),
+            session=create_session(retries=0)
+        )
+        test_report.post_base_report()
+        return test_report.sync_annotations(batch_size=2)
+
+    try:
+        first_errors = _sync([1, 2, 3])
+        first_ids = {annotation["externalId"] for annotation in server.annotations[report_id]}
+
+        # Annotations uploaded without an ID can't be matched, so they're all replaced
+        server.annotations[report_id].append({"path": "file.c", "line": 9, "message": "old"})
+        requests_before = server.requests_received
+        second_errors = _sync([2, 3, 4])
+        replace_requests = server.requests_received - requests_before
+
+        requests_before = server.requests_received
+        third_errors = _sync([3, 4, 5])
+        sync_requests = server.requests_received - requests_before
+    finally:
+        server.stop()
+
+    assert first_errors == second_errors == third_errors == []
+    assert len(first_ids) == 3
+    assert sorted(int(annotation["line"]) for annotation in server.annotations[report_id]) == [3, 4, 5]
+    # PUT report, GET annotations, DELETE all, POST two batches
+    assert replace_requests == 5
+    # PUT report, GET annotations, DELETE the stale one, POST the new one
+    assert sync_requests == 4
+
+
+@pytest.mark.parametrize(
+    "annotations_string",
+    [
+        '{"annotations": [{"path": "a", "line": 1, "message": "m", "severity": "LOW"}, {"message": "n", "severity": "HIGH"}]}',
+        '{"path": "a", "line": 1, "message": "m", "severity": "LOW"}\n\n{"message": "n", "severity": "HIGH"}\n',
+    ],
+)
+def test_json_and_json_lines(tmp_path, annotations_string):
+    """
+    Ensure annotations are read from JSON documents and JSON Lines, whether given as a string or a file
+    """
+    report_file = tmp_path / "report.json"
+    report_file.write_text(annotations_string)
+    expected = [{"path": "a", "line": 1, "message": "m", "severity": "LOW"}, {"message": "n", "severity": "HIGH"}]
+
+    for kwargs in [{"annotations_string": annotations_string}, {"file_name": str(report_file)}]:
+        test_report = Report("test", "test", "test", "test", "test", "test", "test", "test", "FAIL", **kwargs)
+
+        assert [annotation.to_dict() for annotation in test_report.annotations] == expected
+
+
+def test_compact_json_not_decoded_whole():
+    """
+    Ensure a large document on a single line is streamed, rather than decoded whole while sniffing its format
+    """
+    annotations = [{"path": "a", "line": line, "message": "m" * 50, "severity": "LOW"} for line in range(5000)]
+    annotations_string = json.dumps({"annotations": annotations})
+    assert len(annotations_string) > report_module.READ_SIZE
+
+    with patch.object(report_module.json, "loads", wraps=json.loads) as mock_loads:
+        test_report = Report("test", "test", "test", "test", "test", "test", "test", "test", "FAIL", annotations_string)
+
+    assert len(test_report.annotations) == 5000
+    assert all(len(call_args[0][0]) <= report_module.READ_SIZE for call_args in mock_loads.call_args_list)
+
+
+@pytest.mark.parametrize(
+    "annotations_string, error",
+    [
+        ('{"annotations": [{"severity": "LOW"}]}', "Annotation 0 has no message"),
+        ('{"annotations": [{"message": "m", "severity": "LOW"}, {"message": "m"}]}', "Annotation 1 has severity None"),
+        ('{"message": "m", "severity": "LOW", "line": "x"}', "Annotation 0 has invalid line 'x'"),
+        ('{"annotations": [{"message": "m", "severity": "LOW"}', "Expected ','"),
+    ],
+)
+def test_invalid_annotations(annotations_string, error):
+    """
+    Ensure invalid annotations are rejected with the position of the annotation
+    """
+    with pytest.raises(ValueError, match=error):
+        Report("test", "test", "test", "test", "test", "test", "test", "test", "FAIL", annotations_string)
+
+
+def test_max_annotations():
+    """
+    Ensure annotations beyond the maximum are dropped by severity and changed lines, and counted in the data fields
+    """
+    annotations = [{"path": "a.c", "line": line, "message": "m", "severity": "LOW"} for line in range(1, 6)]
+    annotations.append({"path": "a.c", "line": 6, "message": "m", "severity": "HIGH"})
+    test_report = Report(
+        ("user", "password"),
+        "https://bitbucket.example.com",
+        "PROJ",
+        "repo",
+        "commit",
+        "key",
+        "title",
+        "desc",
+        "FAIL",
+        json.dumps({"annotations": annotations}),
+        max_annotations=2,
+        changed_lines={"a.c": [(4, 4)]},
+        session=Mock(),
+    )
+
+    assert [annotation.line for annotation in test_report.annotations] == [4, 6]
+    assert test_report._base_report_body()["data"][-2:] == [
+        {"title": "Annotations not shown", "type": "NUMBER", "value": 4},
+        {"title": "Not shown by severity", "type": "TEXT", "value": "HIGH: 0, MEDIUM: 0, LOW: 4"},
+    ]
+
+
+def test_summary_data():
+    """
+    Ensure the base report carries the annotation totals, the most annotated files and what the tool reported
+    """
+    annotations = [
+        {"path": path, "line": 1, "message": "m", "severity": severity}
+        for path, severity in [("a.c", "LOW"), ("b.c", "HIGH"), ("b.c", "LOW"), ("c.c", "MEDIUM"), ("d.c", "LOW")]
+    ]
+    annotations.append({"message": "whole report", "severity": "LOW"})
+    test_report = Report(
+        ("user", "password"),
+        "https://bitbucket.example.com",
+        "PROJ",
+        "repo",
+        "commit",
+        "key",
+        "title",
+        "desc",
+        "FAIL",
+        json.dumps({"annotations": annotations}),
+        files_scanned=10,
+        tool_duration=1.5,
+        session=Mock(),
+    )
+
+    assert test_report._base_report_body()["data"] == [
+        {"title": "Annotations by severity", "type": "TEXT", "value": "HIGH: 1, MEDIUM: 1, LOW: 4"},
+        {"title": "Files scanned", "type": "NUMBER", "value": 10},
+        {"title": "Most annotated files", "type": "TEXT", "value": "b.c: 2, a.c: 1, c.c: 1"},
+        {"title": "Tool duration", "type": "DURATION", "value": 1500},
+    ]
+
+
+def test_post_to_targets():
+    """
+    Ensure the report is uploaded to every target, serializing each batch of annotations only once
+    """
+    server = FakeCodeInsightsServer().start()
+    annotations = [{"path": "file.c", "line": line, "message": "test", "severity": "LOW"} for line in range(3)]
+    targets = [("PROJ", "repo", "head"), ("PROJ", "repo", "merge"), ("MIRROR", "repo", "head")]
+    test_report = Report(
+        ("user", "password"),
+        server.url,
+        "PROJ",
+        "repo",
+        "head",
+        "key",
+        "title",
+        "desc",
+        "FAIL",
+        json.dumps({"annotations": annotations}),
+        session=create_session(retries=0),
+    )
+
+    try:
+        with patch.object(report_module, "serialize_batch", wraps=report_module.serialize_batch) as mock_body:
+            errors = test_report.post_to_targets(targets, batch_size=2)
+    finally:
+        server.stop()
+
+    assert errors == []
+    assert mock_body.call_count == 2
+    # One PUT and two POSTs for each target
+    assert server.requests_received == 9
+    for target in targets:
+        assert server.reports[target + ("key",)]["result"] == "FAIL"
+        assert sorted(annotation["line"] for annotation in server.annotations[target + ("key",)]) == [0, 1, 2]
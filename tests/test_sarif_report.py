@@ -0,0 +1,122 @@
+import io
+import json
+import os
+from unittest.mock import Mock
+
+from bitbucket_code_insight_reports.sarif_report import SarifReport
+
+SARIF = {
+    "version": "2.1.0",
+    "runs": [
+        {
+            "tool": {
+                "driver": {
+                    "name": "scanner",
+                    "rules": [
+                        {"id": "S001", "defaultConfiguration": {"level": "error"}},
+                        {"id": "S002", "defaultConfiguration": {"level": "note"}},
+                    ],
+                }
+            },
+            "results": [
+                {
+                    "ruleId": "S001",
+                    "message": {"text": "Injection"},
+                    "locations": [
+                        {"physicalLocation": {"artifactLocation": {"uri": "src/app.py"}, "region": {"startLine": 4}}}
+                    ],
+                },
+                {
+                    "ruleId": "S002",
+                    "ruleIndex": 1,
+                    "level": "warning",
+                    "message": {"text": "Weak hash"},
+                    "locations": [
+                        {
+                            "physicalLocation": {
+                                "artifactLocation": {"uri": "file://{cwd}/lib/my%20util.py"},
+                                "region": {"startLine": 10, "startColumn": 3},
+                            }
+                        }
+                    ],
+                },
+                {"ruleId": "S002", "message": {"text": "Whole project"}},
+            ],
+        },
+        {"tool": {"driver": {"name": "other"}}, "results": [{"message": {"text": "No rule"}}]},
+    ],
+}
+
+
+def test_init(tmp_path):
+    """
+    Tests each SARIF result becomes an annotation, with the severity of its level or its rule's default level
+    """
+    sarif_file = tmp_path / "results.sarif"
+    sarif_file.write_text(json.dumps(SARIF).replace("{cwd}", os.getcwd()))
+
+    test_report = SarifReport(
+        "test", "test", "test", "test", "test", "test", "test", "test", file_name=str(sarif_file), session=Mock()
+    )
+
+    assert [annotation.to_dict() for annotation in test_report.annotations] == [
+        {"path": "src/app.py", "line": 4, "message": "S001: Injection", "severity": "HIGH"},
+        {"path": "lib/my util.py", "line": 10, "message": "S002: Weak hash", "severity": "MEDIUM"},
+        {"message": "S002: Whole project", "severity": "LOW"},
+        {"message": "No rule", "severity": "MEDIUM"},
+    ]
+    assert (test_report.result, test_report.return_code) == ("FAIL", 1)
+
+
+def test_no_errors(monkeypatch):
+    """
+    Tests SARIF read from stdin passes without error level results
+    """
+    sarif = {"runs": [{"tool": {"driver": {"name": "scanner"}}, "results": [{"message": {"text": "m"}}]}]}
+    monkeypatch.setattr("sys.stdin", io.StringIO(json.dumps(sarif)))
+
+    test_report = SarifReport("test", "test", "test", "test", "test", "test", "test", "test", session=Mock())
+
+    assert len(test_report.annotations) == 1
+    assert (test_report.result, test_report.return_code) == ("PASS", 0)
+
+
+def test_suppressed_and_passing_results(tmp_path):
+    """
+    Tests suppressed results and results which aren't failures don't become annotations or fail the report
+    """
+    error = {"level": "error", "locations": [{"physicalLocation": {"artifactLocation": {"uri": "a.py"}}}]}
+    results = [
+        dict(error, message={"text": "Suppressed"}, suppressions=[{"kind": "inSource"}]),
+        dict(error, message={"text": "Passed"}, kind="pass"),
+        dict(error, message={"text": "Not applicable"}, kind="notApplicable"),
+        dict(error, message={"text": "Rejected"}, suppressions=[{"kind": "external", "status": "rejected"}]),
+        {"message": {"text": "Review"}, "kind": "review", "ruleIndex": 0},
+    ]
+    sarif = {
+        "runs": [
+            {
+                "tool": {"driver": {"name": "scanner", "rules": [{"defaultConfiguration": {"level": "error"}}]}},
+                "results": results,
+            }
+        ]
+    }
+    sarif_file = tmp_path / "results.sarif"
+    sarif_file.write_text(json.dumps(sarif))
+
+    test_report = SarifReport(
+        "test", "test", "test", "test", "test", "test", "test", "test", file_name=str(sarif_file), session=Mock()
+    )
+
+    assert [annotation.to_dict() for annotation in test_report.annotations] == [
+        {"path": "a.py", "message": "Rejected", "severity": "HIGH"},
+        {"message": "Review", "severity": "LOW"},
+    ]
+    assert (test_report.result, test_report.return_code) == ("FAIL", 1)
+
+    sarif["runs"][0]["results"] = results[:3] + results[4:]
+    sarif_file.write_text(json.dumps(sarif))
+    test_report = SarifReport(
+        "test", "test", "test", "test", "test", "test", "test", "test", file_name=str(sarif_file), session=Mock()
+    )
+    assert (test_report.result, test_report.return_code) == ("PASS", 0)
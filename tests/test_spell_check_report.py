@@ -1,8 +1,11 @@
 import pytest
+import scspell
 
 from unittest.mock import patch
 from hypothesis import strategies as strat, given, example
 
+from bitbucket_code_insight_reports.cache import ResultCache
+from bitbucket_code_insight_reports.dict_index import compile_index
 from bitbucket_code_insight_reports.spell_check_report import SpellCheckReport
 
 
@@ -24,7 +27,7 @@ def gen_scspell_annotation():
             dicts["annotations"].append(
                 {
                     "path": result[0],
-                    "line": str(result[1]),
+                    "line": result[1],
                     "message": "'{word}' not found in dictionary (from token '{word}')".format(
                         path=result[0], line=result[1], word=result[2]
                     ),
@@ -68,4 +71,182 @@ def test_init(word, mock_spellcheck, mock_stringio, gen_scspell_annotation):
     assert mock_spellcheck.called_with(["test/file.cpp", "file3.cpp"], report_only=True, base_dicts=None)
 
     assert test_report.result == "FAIL"
-    assert test_report.annotations == test_annotations
+    assert [annotation.to_dict() for annotation in test_report.annotations] == test_annotations["annotations"]
+    assert {"title": "Files scanned", "type": "NUMBER", "value": 2} in test_report.data
+
+
+def test_parallel_matches_serial(tmp_path):
+    """
+    Tests sharding the files across worker processes gives the same result, in the same order, as a serial run
+    """
+    files = []
+    for index in range(6):
+        test_file = tmp_path / "file{index}.txt".format(index=index)
+        test_file.write_text("hello wrold\nspeling misteak {index}\n".format(index=index))
+        files.append(str(test_file))
+
+    serial = SpellCheckReport._check_files(files, [], 1)
+    parallel = SpellCheckReport._check_files(files, [], 3)
+
+    assert serial[0] is False
+    assert serial == parallel
+
+
+def test_cached_results(tmp_path):
+    """
+    Tests unchanged files are answered from the cache and only changed files are spell checked again
+    """
+    files = []
+    for index in range(3):
+        test_file = tmp_path / "file{index}.txt".format(index=index)
+        test_file.write_text("hello wrold {index}\n".format(index=index))
+        files.append(str(test_file))
+    cache = ResultCache(str(tmp_path / "cache"))
+
+    first_run = SpellCheckReport._check_files_cached(files, [], 1, cache)
+    (tmp_path / "file1.txt").write_text("hello world\nmisteak\n")
+
+    with patch.object(SpellCheckReport, "_check_files", wraps=SpellCheckReport._check_files) as mock_check:
+        second_run = SpellCheckReport._check_files_cached(files, [], 1, cache)
+
+    mock_check.assert_called_once_with([files[1]], [], 1)
+    assert first_run == (
+        False,
+        "\n".join("{path}:1: 'wrold' not found in dictionary (from token 'wrold')".format(path=path) for path in files),
+    )
+    assert second_run[1].split("\n") == [
+        "{path}:1: 'wrold' not found in dictionary (from token 'wrold')".format(path=files[0]),
+        "{path}:2: 'misteak' not found in dictionary (from token 'misteak')".format(path=files[1]),
+        "{path}:1: 'wrold' not found in dictionary (from token 'wrold')".format(path=files[2]),
+    ]
+
+
+def test_cached_results_per_file_type(tmp_path):
+    """
+    Tests cached results aren't reused for files of another type or with another file ID, which are checked against
+    other dictionaries
+    """
+    dictionary = tmp_path / "dictionary.txt"
+    dictionary.write_text("FILETYPE: Python; .py\nwrold\n\nFILEID: abc\nmisteak\n\nNATURAL:\nhello\n")
+    python_file = tmp_path / "first.py"
+    python_file.write_text("hello wrold\n")
+    text_file = tmp_path / "second.txt"
+    text_file.write_text("hello wrold\n")
+    id_file = tmp_path / "third.txt"
+    id_file.write_text("scspell-id: abc\nmisteak\n")
+    cache = ResultCache(str(tmp_path / "cache"))
+
+    python_run = SpellCheckReport._check_files_cached([str(python_file)], [str(dictionary)], 1, cache)
+    text_run = SpellCheckReport._check_files_cached([str(text_file)], [str(dictionary)], 1, cache)
+    id_run = SpellCheckReport._check_files_cached([str(id_file)], [str(dictionary)], 1, cache)
+
+    assert python_run == (True, "")
+    assert text_run == (False, "{path}:1: 'wrold' not found in dictionary (from token 'wrold')".format(path=text_file))
+    assert id_run == (True, "")
+
+
+def test_cached_results_main_dictionary(tmp_path, monkeypatch):
+    """
+    Tests cached results aren't reused once words are added to scspell's main dictionary
+    """
+    main_dictionary = tmp_path / "dictionary.txt"
+    main_dictionary.write_text("NATURAL:\nhello\n")
+    monkeypatch.setattr(scspell, "find_dict_file", lambda override_dictionary: str(main_dictionary))
+    checked = tmp_path / "checked.txt"
+    checked.write_text("hello wrold\n")
+    cache = ResultCache(str(tmp_path / "cache"))
+
+    first_run = SpellCheckReport._check_files_cached([str(checked)], [], 1, cache)
+    main_dictionary.write_text("NATURAL:\nhello\nwrold\n")
+    second_run = SpellCheckReport._check_files_cached([str(checked)], [], 1, cache)
+
+    assert first_run[0] is False
+    assert second_run == (True, "")
+
+
+def test_changed_lines_only(tmp_path):
+    """
+    Tests only the changed lines are spell checked, keeping their line numbers, and unchanged files are skipped
+    """
+    changed = tmp_path / "changed.txt"
+    changed.write_text("wrold\nspeling\nmisteak\ntypoo\n")
+    unchanged = tmp_path / "unchanged.txt"
+    unchanged.write_text("wrold\n")
+
+    okay, output = SpellCheckReport._check_changed_lines(
+        [str(changed), str(unchanged)], {str(changed): [(2, 3)]}, [], 1, None
+    )
+
+    assert okay is False
+    assert output.split("\n") == [
+        "{path}:2: 'speling' not found in dictionary (from token 'speling')".format(path=changed),
+        "{path}:3: 'misteak' not found in dictionary (from token 'misteak')".format(path=changed),
+    ]
+
+
+def test_changed_lines_file_id(tmp_path):
+    """
+    Tests changed lines are checked against the file ID dictionary of their file when its header is unchanged
+    """
+    dictionary = tmp_path / "dictionary.txt"
+    dictionary.write_text("FILEID: abc\nmisteak\n\nNATURAL:\nhello\n")
+    changed = tmp_path / "changed.txt"
+    changed.write_text("# scspell-id: abc typoo\nhello\nmisteak speling\n")
+
+    okay, output = SpellCheckReport._check_changed_lines(
+        [str(changed)], {str(changed): [(3, 3)]}, [str(dictionary)], 1, None
+    )
+
+    assert okay is False
+    assert output == "{path}:3: 'speling' not found in dictionary (from token 'speling')".format(path=changed)
+
+
+def test_dict_index(tmp_path):
+    """
+    Tests words in the dictionary index are accepted, including within findings of several words
+    """
+    checked = tmp_path / "checked.txt"
+    checked.write_text("wrold\nmisteakTypoo\nspeling\n")
+    dictionary = tmp_path / "dictionary.txt"
+    dictionary.write_text("NATURAL:\nwrold\ntypoo\nspeling\n")
+    index_file = str(tmp_path / "words.idx")
+    compile_index([str(dictionary)], index_file)
+
+    test_report = SpellCheckReport(
+        "test", "test", "test", "test", "test", "test", "test", "test", [str(checked)], dict_index=index_file
+    )
+    assert [(annotation.line, annotation.message) for annotation in test_report.annotations] == [
+        (2, "'misteak' not found in dictionary (from token 'misteakTypoo')")
+    ]
+    assert test_report.result == "FAIL"
+
+    dictionary.write_text("NATURAL:\nwrold\nmisteak\ntypoo\nspeling\n")
+    compile_index([str(dictionary)], index_file)
+    test_report = SpellCheckReport(
+        "test", "test", "test", "test", "test", "test", "test", "test", [str(checked)], dict_index=index_file
+    )
+    assert test_report.annotations == []
+    assert test_report.result == "PASS"
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_missing_file(tmp_path, capsys, cached):
+    """
+    Tests files scspell can't read are reported on stderr without losing the findings of the other files
+    """
+    first = tmp_path / "first.txt"
+    first.write_text("wrold\n")
+    second = tmp_path / "second.txt"
+    second.write_text("misteak\n")
+    files = [str(first), str(tmp_path / "missing.txt"), str(second)]
+    cache = ResultCache(str(tmp_path / "cache")) if cached else None
+
+    test_report = SpellCheckReport("test", "test", "test", "test", "test", "test", "test", "test", files, cache=cache)
+
+    assert [(annotation.path, annotation.line) for annotation in test_report.annotations] == [
+        (str(first), 1),
+        (str(second), 1),
+    ]
+    assert test_report.result == "FAIL"
+    if not cached:
+        assert "missing.txt" in capsys.readouterr().err
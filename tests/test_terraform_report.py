@@ -4,6 +4,7 @@ from unittest.mock import patch, mock_open, call, Mock
 
 from hypothesis import strategies as strat, given
 
+from bitbucket_code_insight_reports.cache import ResultCache
 from bitbucket_code_insight_reports.terraform_report import TerraformReport
 
 
@@ -25,7 +26,7 @@ def gen_terraform_annotation():
             dicts["annotations"].append(
                 {
                     "path": loc[0],
-                    "line": str(loc[1]),
+                    "line": loc[1],
                     "message": "Error found in this block. Run `terraform fmt --diff -check` to see the issue (or run without `-check` to fix automatically)",
                     "severity": "HIGH",
                 }
@@ -59,4 +60,75 @@ def test_init(mock_terraform, gen_terraform_annotation):
     test_report = TerraformReport("test", "test.coam", "test", "test", "test", "test", "test", "test")
 
     assert test_report.result == "PASS"
-    assert test_report.annotations == test_annotations
+    assert [annotation.to_dict() for annotation in test_report.annotations] == test_annotations["annotations"]
+
+
+@patch("bitbucket_code_insight_reports.terraform_report.Terraform.cmd")
+def test_parallel_directories(mock_terraform, gen_terraform_annotation, tmp_path, monkeypatch):
+    """
+    Tests each directory with terraform files is checked separately, with the results kept in directory order
+    """
+    for directory in ["modules/b", "modules/a", ".terraform/modules/x", "docs"]:
+        (tmp_path / directory).mkdir(parents=True)
+    for file_name in ["main.tf", "modules/b/main.tf", "modules/a/vars.tfvars", ".terraform/modules/x/main.tf"]:
+        (tmp_path / file_name).write_text("")
+    monkeypatch.chdir(tmp_path)
+
+    outputs = {
+        "modules/a": gen_terraform_annotation([("modules/a/vars.tfvars", 3)]),
+        "modules/b": gen_terraform_annotation([("modules/b/main.tf", 7)]),
+    }
+
+    def _fmt(cmd, directory, **kwargs):
+        if directory in outputs:
+            return 3, outputs[directory][1], ""
+        return 0, "", ""
+
+    mock_terraform.side_effect = _fmt
+    test_report = TerraformReport("test", "test.coam", "test", "test", "test", "test", "test", "test", jobs=4)
+
+    assert sorted(call_args[0][1] for call_args in mock_terraform.call_args_list) == [".", "modules/a", "modules/b"]
+    assert mock_terraform.call_args_list[0][1] == {"capture_output": True, "check": True, "diff": True}
+    assert test_report.result == "FAIL"
+    assert test_report.return_code == 3
+    assert [annotation.to_dict() for annotation in test_report.annotations] == (
+        outputs["modules/a"][0]["annotations"] + outputs["modules/b"][0]["annotations"]
+    )
+
+
+@patch("bitbucket_code_insight_reports.terraform_report.Terraform.cmd")
+def test_changed_files_cached(mock_terraform, gen_terraform_annotation, tmp_path, monkeypatch):
+    """
+    Tests only changed terraform files are checked, and files with unchanged contents aren't checked again
+    """
+    monkeypatch.chdir(tmp_path)
+    for file_name in ["a.tf", "b.tf", "notes.md"]:
+        (tmp_path / file_name).write_text(file_name)
+    test_annotations, diff_output = gen_terraform_annotation([("b.tf", 2)])
+
+    def _terraform(cmd, *args, **kwargs):
+        if cmd == "version":
+            return 0, "Terraform v0.12.0\n", ""
+        return (3, diff_output, "") if args[0] == "b.tf" else (0, "", "")
+
+    mock_terraform.side_effect = _terraform
+    cache = ResultCache(str(tmp_path / "cache"))
+    changed_files = ["a.tf", "b.tf", "notes.md", "deleted.tf"]
+
+    first = TerraformReport(
+        "test", "test.coam", "test", "test", "test", "test", "test", "test", changed_files=changed_files, cache=cache
+    )
+    fmt_calls = [call_args[0][1] for call_args in mock_terraform.call_args_list if call_args[0][0] == "fmt"]
+
+    (tmp_path / "a.tf").write_text("changed")
+    mock_terraform.reset_mock()
+    second = TerraformReport(
+        "test", "test.coam", "test", "test", "test", "test", "test", "test", changed_files=changed_files, cache=cache
+    )
+    cached_fmt_calls = [call_args[0][1] for call_args in mock_terraform.call_args_list if call_args[0][0] == "fmt"]
+
+    assert fmt_calls == ["a.tf", "b.tf"]
+    assert cached_fmt_calls == ["a.tf"]
+    for test_report in [first, second]:
+        assert test_report.return_code == 3
+        assert [annotation.to_dict() for annotation in test_report.annotations] == test_annotations["annotations"]
@@ -0,0 +1,166 @@
+import os
+import subprocess
+from io import StringIO
+
+import pytest
+
+from bitbucket_code_insight_reports.unified_diff import (
+    iter_hunks,
+    changed_line_ranges,
+    git_changed_files,
+    git_changed_line_ranges,
+    in_ranges,
+    Hunk,
+)
+
+GIT_DIFF = """diff --git a/src/main.c b/src/main.c
+index commitone..committwo 100644
+--- a/src/main.c
++++ b/src/main.c
+@@ -3,4 +3,4 @@ int main()
+ int a;
+---- removed line which looks like a header
++++++ added line which looks like a header
+ int b;
+ int c;
+@@ -20 +20 @@
+-old
++new
+diff --git a/src/new.c b/src/new.c
+new file mode 100644
+index 0000000..committwo
+--- /dev/null
++++ b/src/new.c
+@@ -0,0 +1,2 @@
++int d;
++int e;
+diff --git a/src/gone.c b/src/gone.c
+deleted file mode 100644
+--- a/src/gone.c
++++ /dev/null
+@@ -1 +0,0 @@
+-int f;
+\\ No newline at end of file
+"""
+
+TERRAFORM_DIFF = """infra/main.tf
+--- old/infra/main.tf
++++ new/infra/main.tf
+@@ -5,3 +5,3 @@
+ resource "a" "b" {
+-  x  = 1
++  x = 1
+ }
+infra/provider.tf
+--- old/infra/provider.tf
++++ new/infra/provider.tf
+@@ -146,1 +146,1 @@
+-provider  "c" {}
++provider "c" {}
+"""
+
+
+def test_git_diff_hunks():
+    """
+    Tests hunks are found in git diff output, including new and deleted files and misleading content lines
+    """
+    assert list(iter_hunks(StringIO(GIT_DIFF))) == [
+        Hunk("src/main.c", 3, 4),
+        Hunk("src/main.c", 20, 1),
+        Hunk("src/new.c", 0, 0),
+        Hunk("src/gone.c", 1, 1),
+    ]
+
+
+def test_terraform_hunks():
+    """
+    Tests hunks are found in `terraform fmt -diff` output
+    """
+    assert list(iter_hunks(StringIO(TERRAFORM_DIFF))) == [
+        Hunk("infra/main.tf", 5, 3),
+        Hunk("infra/provider.tf", 146, 1),
+    ]
+
+
+def test_changed_line_ranges():
+    """
+    Tests the index of changed lines only covers added lines, on the new side of the diff
+    """
+    assert changed_line_ranges(StringIO(GIT_DIFF)) == {
+        "src/main.c": [(4, 4), (20, 20)],
+        "src/new.c": [(1, 2)],
+    }
+
+
+def test_in_ranges():
+    """
+    Tests lines are looked up in sorted ranges, including their first and last lines
+    """
+    ranges = [(4, 4), (10, 12)]
+    assert [line for line in range(1, 15) if in_ranges(ranges, line)] == [4, 10, 11, 12]
+    assert not in_ranges([], 1)
+
+
+def test_git_changed_files(tmp_path, monkeypatch):
+    """
+    Tests the files added or modified since the base commit are listed relative to the current directory
+    """
+    monkeypatch.chdir(tmp_path)
+
+    def _git(*args):
+        subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com"] + list(args), check=True)
+
+    _git("init", "-q")
+    for name in ["infra/kept.tf", "infra/changed.tf", "infra/removed.tf", "README.md"]:
+        os.makedirs(os.path.dirname(name) or ".", exist_ok=True)
+        with open(name, "w") as test_file:
+            test_file.write("original\n")
+    _git("add", ".")
+    _git("commit", "-q", "-m", "base")
+    _git("tag", "base")
+
+    with open("infra/changed.tf", "a") as test_file:
+        test_file.write("changed\n")
+    with open("infra/added.tf", "w") as test_file:
+        test_file.write("added\n")
+    os.remove("infra/removed.tf")
+    _git("add", "-A")
+    _git("commit", "-q", "-m", "change")
+
+    assert sorted(git_changed_files("base")) == ["infra/added.tf", "infra/changed.tf"]
+    monkeypatch.chdir(tmp_path / "infra")
+    assert sorted(git_changed_files("base")) == ["added.tf", "changed.tf"]
+    with pytest.raises(ValueError):
+        git_changed_files("missing")
+
+
+def test_git_changed_line_ranges(tmp_path, monkeypatch):
+    """
+    Tests the changed lines since the base commit are indexed by paths relative to the current directory, whatever
+    the diff prefixes are configured to
+    """
+    monkeypatch.chdir(tmp_path)
+
+    def _git(*args):
+        subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com"] + list(args), check=True)
+
+    _git("init", "-q")
+    _git("config", "diff.noprefix", "true")
+    os.makedirs("sub")
+    for name in ["sub/a.txt", "README.md"]:
+        with open(name, "w") as test_file:
+            test_file.write("original\n")
+    _git("add", ".")
+    _git("commit", "-q", "-m", "base")
+    _git("tag", "base")
+
+    for name in ["sub/a.txt", "README.md"]:
+        with open(name, "a") as test_file:
+            test_file.write("changed\n")
+    _git("commit", "-q", "-a", "-m", "change")
+
+    assert git_changed_line_ranges("base") == {"README.md": [(2, 2)], "sub/a.txt": [(2, 2)]}
+    monkeypatch.chdir(tmp_path / "sub")
+    assert git_changed_line_ranges("base") == {"a.txt": [(2, 2)]}
+    with pytest.raises(ValueError):
+        git_changed_line_ranges("missing")